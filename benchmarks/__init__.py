@@ -0,0 +1,4 @@
+#! /usr/bin/env python3.5
+# Copyright 2017 Gavin Hurlbut
+# vim:ts=4:sw=4:ai:et:si:sts=4
+
@@ -0,0 +1,168 @@
+#! /usr/bin/env python3.5
+# Copyright 2017 Gavin Hurlbut
+# vim:ts=4:sw=4:ai:et:si:sts=4
+
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from itertools import chain
+
+from plateball.loggingcore import setupLogging
+from plateball.database.access import PlateballDatabase, chunked
+from plateball.scorefile import iterScoreRecords
+from benchmarks.synthetic import buildLeagues, buildSeasons, scoreRecords
+
+logger = logging.getLogger(__name__)
+
+
+class Timer(object):
+    def __init__(self):
+        self.results = {}
+
+    def time(self, name, func, items=None):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        if items is None and isinstance(result, int):
+            items = result
+        entry = {"seconds": round(elapsed, 6)}
+        if items:
+            entry["items"] = items
+            entry["per_item"] = elapsed / items
+        self.results[name] = entry
+        logger.info("%s: %.3fs%s" % (name, elapsed,
+                    " (%s items)" % items if items else ""))
+        return result
+
+
+def ingestFile(db, filename, chunkSize):
+    # Same path as --record_scores
+    count = 0
+    with open(filename, "r") as f:
+        records = ((record["id"], record["scores"])
+                   for (num, record) in iterScoreRecords(f))
+        for chunk in chunked(records, chunkSize):
+            count += sum(db.recordScores(chunk))
+    return count
+
+
+def runBenchmarks(args, workdir):
+    timer = Timer()
+    dbfile = os.path.join(workdir, "bench.db")
+    db = PlateballDatabase(dbfile)
+
+    buildLeagues(db, args.leagues, args.teams, args.seasons)
+    timer.time("createGames",
+               lambda: buildSeasons(db, args.seasons, args.seed))
+
+    records = list(scoreRecords(args.complete, args.seed))
+    half = len(records) // 2
+    scoreFile = os.path.join(workdir, "scores.ndjson")
+    with open(scoreFile, "w") as f:
+        for record in records[half:]:
+            f.write(json.dumps(record) + "\n")
+
+    timer.time("recordScores",
+               lambda: sum(db.recordScores([(record["id"], record["scores"])
+                                            for record in records[:half]])))
+    timer.time("record_scores",
+               lambda: ingestFile(db, scoreFile, args.chunk_size))
+
+    leagues = list(chain.from_iterable(
+        db.getLeagues(season) for season in range(1, args.seasons + 1)))
+    timer.time("getNextGames",
+               lambda: sum(len(list(db.iterNextGames(league)))
+                           for league in leagues))
+    timer.time("getNextGameRows",
+               lambda: sum(len(list(db.iterNextGames(league, rows=True)))
+                           for league in leagues))
+    timer.time("standings",
+               lambda: sum(len(list(db.getStandings(league)))
+                           for league in leagues))
+    timer.time("standingRows",
+               lambda: sum(len(list(db.getStandingRows(league)))
+                           for league in leagues))
+
+    if not args.skip_print:
+        # Deferred so a run without printing never loads reportlab
+        from plateball.printing import printScorecards
+        from plateball.qrcache import QRCodeCache
+        league = leagues[0]
+        output = os.path.join(workdir, "cards.pdf")
+        qrCache = QRCodeCache(os.path.join(workdir, "qrcache"))
+        games = list(db.iterNextGames(league, args.print_count, rows=True))
+        timer.time("print_games",
+                   lambda: printScorecards(games, output, args.jobs,
+                                           qrCache) and len(games))
+        timer.time("print_games_cached",
+                   lambda: printScorecards(games, output, args.jobs,
+                                           qrCache) and len(games))
+
+    db.close()
+    return timer.results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plateball benchmarks")
+    parser.add_argument('--leagues', type=int, default=2)
+    parser.add_argument('--teams', type=int, default=13,
+                        help="Teams per league (at most 26)")
+    parser.add_argument('--seasons', type=int, default=1)
+    parser.add_argument('--complete', type=float, default=0.5,
+                        help="Fraction of games with recorded scores")
+    parser.add_argument('--seed', type=int, default=2017)
+    parser.add_argument('--chunk_size', type=int, default=1000)
+    parser.add_argument('--print_count', type=int, default=300)
+    parser.add_argument('--jobs', type=int, default=1)
+    parser.add_argument('--skip_print', action="store_true")
+    parser.add_argument('--workdir', help="Keep the database here")
+    parser.add_argument('--output', help="Results file (JSON), else stdout")
+    args = parser.parse_args()
+
+    setupLogging(logging.INFO)
+
+    workdir = args.workdir
+    if workdir:
+        os.makedirs(workdir, exist_ok=True)
+    else:
+        workdir = tempfile.mkdtemp(prefix="plateball-bench-")
+
+    try:
+        results = runBenchmarks(args, workdir)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "timestamp": int(time.time()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "leagues": args.leagues,
+            "teams": args.teams,
+            "seasons": args.seasons,
+            "complete": args.complete,
+            "seed": args.seed,
+            "chunk_size": args.chunk_size,
+            "print_count": args.print_count,
+            "jobs": args.jobs,
+        },
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    else:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        print()
+
+
+if __name__ == "__main__":
+    main()
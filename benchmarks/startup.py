@@ -0,0 +1,129 @@
+#! /usr/bin/env python3.5
+# Copyright 2017 Gavin Hurlbut
+# vim:ts=4:sw=4:ai:et:si:sts=4
+
+import argparse
+import json
+import logging
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+BASEDIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+SCRIPT = os.path.join(BASEDIR, "plateball.py")
+
+# Top level packages only the printing path should load
+HEAVY_MODULES = ["reportlab", "qrcode", "PIL"]
+
+# Modes that must start without any of HEAVY_MODULES
+LIGHT_MODES = ["standings", "record_scores"]
+
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def runCLI(dbfile, arguments):
+    """Run plateball.py with -X importtime, returning (seconds, imports).
+
+    imports maps each top level module imported to its cumulative import
+    time in microseconds."""
+    command = [sys.executable, "-X", "importtime", SCRIPT, "--db", dbfile]
+    command.extend(arguments)
+    start = time.perf_counter()
+    proc = subprocess.run(command, stdout=subprocess.DEVNULL,
+                          stderr=subprocess.PIPE, universal_newlines=True)
+    elapsed = time.perf_counter() - start
+    if proc.returncode:
+        errors = [line for line in proc.stderr.splitlines()
+                  if not IMPORT_LINE.match(line)]
+        raise RuntimeError("%s failed: %s" % (" ".join(arguments),
+                                              "\n".join(errors)))
+
+    imports = {}
+    for line in proc.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        package = match.group(4).split(".")[0]
+        cumulative = int(match.group(2))
+        imports[package] = max(imports.get(package, 0), cumulative)
+    return (elapsed, imports)
+
+
+def setupDatabase(workdir):
+    dbfile = os.path.join(workdir, "startup.db")
+    scores = os.path.join(workdir, "scores.ndjson")
+    runCLI(dbfile, ["--create_league", "--name", "Startup", "--season", "1"])
+    runCLI(dbfile, ["--create_teams", "--league", "1", "--teams", "AB"])
+    runCLI(dbfile, ["--create_games", "--season", "1", "--seed", "1"])
+    # Game 0 is rejected before any write, so repeated runs of
+    # --record_scores see the same database
+    with open(scores, "w") as f:
+        f.write(json.dumps({"id": 0, "scores": [[0, 1]] * 9}) + "\n")
+    return (dbfile, scores)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plateball startup time")
+    parser.add_argument('--repeat', type=int, default=5,
+                        help="Runs per mode, the fastest is reported")
+    parser.add_argument('--output', help="Results file (JSON), else stdout")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    workdir = tempfile.mkdtemp(prefix="plateball-startup-")
+    try:
+        (dbfile, scores) = setupDatabase(workdir)
+        modes = {
+            "standings": ["--standings", "--league", "1"],
+            "record_scores": ["--record_scores", "--scores", scores],
+            "print_games": ["--print_games", "--league", "1", "--count", "1",
+                            "--output", os.path.join(workdir, "cards.pdf"),
+                            "--qr_cache", os.path.join(workdir, "qrcache")],
+        }
+
+        results = {}
+        for (mode, arguments) in sorted(modes.items()):
+            runs = [runCLI(dbfile, arguments) for i in range(args.repeat)]
+            (elapsed, imports) = min(runs, key=lambda item: item[0])
+            heavy = {name: imports[name] for name in HEAVY_MODULES
+                     if name in imports}
+            results[mode] = {
+                "seconds": round(elapsed, 6),
+                "modules": len(imports),
+                "heavy_modules": heavy,
+            }
+            logger.info("%s: %.3fs, heavy: %s" %
+                        (mode, elapsed, ", ".join(sorted(heavy)) or "none"))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "timestamp": int(time.time()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    else:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        print()
+
+    failed = [mode for mode in LIGHT_MODES if results[mode]["heavy_modules"]]
+    if failed:
+        logger.error("Heavy modules loaded by: %s" % ", ".join(failed))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
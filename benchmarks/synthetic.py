@@ -0,0 +1,57 @@
+#! /usr/bin/env python3.5
+# Copyright 2017 Gavin Hurlbut
+# vim:ts=4:sw=4:ai:et:si:sts=4
+
+import logging
+import string
+from random import Random
+
+from plateball.database.schema import Game
+
+logger = logging.getLogger(__name__)
+
+
+def randomScores(rng, maxRuns=3):
+    """Inning by inning [away, home] scores for a game that is decided"""
+    scores = []
+    runsHome = 0
+    runsAway = 0
+    while len(scores) < 9 or runsHome == runsAway:
+        away = rng.randint(0, maxRuns)
+        home = rng.randint(0, maxRuns)
+        scores.append([away, home])
+        runsAway += away
+        runsHome += home
+    return scores
+
+
+def buildLeagues(db, leagues, teams, seasons):
+    """Create leagues x teams for each season, without any games"""
+    if teams > len(string.ascii_uppercase):
+        raise ValueError("At most %s teams per league" %
+                         len(string.ascii_uppercase))
+
+    for season in range(1, seasons + 1):
+        for leagueNum in range(1, leagues + 1):
+            db.createLeague("League %s" % leagueNum, season)
+
+        for league in list(db.getLeagues(season)):
+            db.createTeams(league, list(string.ascii_uppercase[:teams]))
+
+
+def buildSeasons(db, seasons, seed=None):
+    """Schedule every season, returning the number of games created"""
+    games = 0
+    for season in range(1, seasons + 1):
+        counts = db.createGames(season, seed=seed)
+        games += sum(counts.values())
+    return games
+
+
+def scoreRecords(fraction, seed=None):
+    """Yield {"id", "scores"} records for a fraction of all games"""
+    rng = Random(seed)
+    query = Game.select(Game.id).order_by(Game.id).tuples()
+    for (gameid,) in query:
+        if rng.random() < fraction:
+            yield {"id": gameid, "scores": randomScores(rng)}
@@ -0,0 +1,37 @@
+#! /usr/bin/env python3.5
+# Copyright 2017 Gavin Hurlbut
+# vim:ts=4:sw=4:ai:et:si:sts=4
+
+import importlib
+import importlib.util
+import logging
+import sys
+from abc import ABC, abstractmethod
+
+logger = logging.getLogger(__name__)
+
+
+class Command(ABC):
+    """One command line mode.
+
+    Each mode lives in its own module in this package, exporting its
+    subclass as "command", and imports its heavy dependencies (reportlab,
+    qrcode, ...) itself so other modes never load them."""
+    def __init__(self, db, args):
+        self.db = db
+        self.args = args
+
+    def usage(self, message):
+        logger.error(message)
+        sys.exit(1)
+
+    @abstractmethod
+    def run(self):
+        """Carry out the mode, returning its result"""
+
+
+def loadCommand(mode):
+    name = "%s.%s" % (__name__, mode)
+    if importlib.util.find_spec(name) is None:
+        return None
+    return importlib.import_module(name).command
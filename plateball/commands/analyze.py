@@ -0,0 +1,14 @@
+#! /usr/bin/env python3.5
+# Copyright 2017 Gavin Hurlbut
+# vim:ts=4:sw=4:ai:et:si:sts=4
+
+from plateball.commands import Command
+
+
+class AnalyzeCommand(Command):
+    def run(self):
+        self.db.analyze()
+        return True
+
+
+command = AnalyzeCommand
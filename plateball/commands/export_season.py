@@ -0,0 +1,35 @@
+#! /usr/bin/env python3.5
+# Copyright 2017 Gavin Hurlbut
+# vim:ts=4:sw=4:ai:et:si:sts=4
+
+import logging
+
+from plateball.commands import Command
+from plateball.profiling import phase
+from plateball.snapshot import exportSeason
+
+logger = logging.getLogger(__name__)
+
+
+class ExportSeasonCommand(Command):
+    def run(self):
+        if self.args.season is None or not self.args.snapshot:
+            self.usage("Export mode needs --season and --snapshot")
+
+        with phase("export"):
+            manifest = exportSeason(self.db, self.args.season,
+                                    self.args.snapshot)
+        for (table, entry) in sorted(manifest["tables"].items()):
+            print("%s: %s rows" % (table, entry["rows"]))
+
+        if self.args.purge:
+            # The manifest is only written once every column is on disk
+            with phase("purge"):
+                self.db.deleteSeason(self.args.season)
+            logger.info("Archived season %s to %s" %
+                        (self.args.season, self.args.snapshot))
+
+        return manifest
+
+
+command = ExportSeasonCommand
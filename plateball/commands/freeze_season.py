@@ -0,0 +1,22 @@
+#! /usr/bin/env python3.5
+# Copyright 2017 Gavin Hurlbut
+# vim:ts=4:sw=4:ai:et:si:sts=4
+
+from plateball.commands import Command
+
+
+class FreezeSeasonCommand(Command):
+    def run(self):
+        if self.args.season is None:
+            self.usage("Freeze mode needs --season")
+
+        try:
+            self.db.freezeSeason(self.args.season)
+        except ValueError as e:
+            self.usage(str(e))
+
+        print("Season %s is read-only" % self.args.season)
+        return True
+
+
+command = FreezeSeasonCommand
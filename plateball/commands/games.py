@@ -0,0 +1,22 @@
+#! /usr/bin/env python3.5
+# Copyright 2017 Gavin Hurlbut
+# vim:ts=4:sw=4:ai:et:si:sts=4
+
+from plateball.commands import Command
+
+
+class GamesCommand(Command):
+    def run(self):
+        if self.args.season is None:
+            self.usage("Games mode needs --season")
+
+        kwargs = {"seed": self.args.seed}
+        if self.args.chunk_size:
+            kwargs["chunkSize"] = self.args.chunk_size
+        counts = self.db.createGames(self.args.season, **kwargs)
+        for (leagueName, count) in sorted(counts.items()):
+            print("%s: %s games" % (leagueName, count))
+        return counts
+
+
+command = GamesCommand
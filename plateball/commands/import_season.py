@@ -0,0 +1,28 @@
+#! /usr/bin/env python3.5
+# Copyright 2017 Gavin Hurlbut
+# vim:ts=4:sw=4:ai:et:si:sts=4
+
+from plateball.commands import Command
+from plateball.profiling import phase
+from plateball.snapshot import importSeason
+
+
+class ImportSeasonCommand(Command):
+    def run(self):
+        if not self.args.snapshot:
+            self.usage("Import mode needs --snapshot")
+
+        with phase("import"):
+            try:
+                manifest = importSeason(self.db, self.args.snapshot)
+            except ValueError as e:
+                self.usage(str(e))
+
+        print("Restored season %s" % manifest["season"])
+        for (table, entry) in sorted(manifest["tables"].items()):
+            print("%s: %s rows" % (table, entry["rows"]))
+
+        return manifest
+
+
+command = ImportSeasonCommand
@@ -0,0 +1,16 @@
+#! /usr/bin/env python3.5
+# Copyright 2017 Gavin Hurlbut
+# vim:ts=4:sw=4:ai:et:si:sts=4
+
+from plateball.commands import Command
+
+
+class LeagueCommand(Command):
+    def run(self):
+        if not self.args.name or self.args.season is None:
+            self.usage("League mode needs --name and --season")
+
+        return self.db.createLeague(self.args.name, self.args.season)
+
+
+command = LeagueCommand
@@ -0,0 +1,45 @@
+#! /usr/bin/env python3.5
+# Copyright 2017 Gavin Hurlbut
+# vim:ts=4:sw=4:ai:et:si:sts=4
+
+from itertools import chain
+
+from plateball.commands import Command
+from plateball.printing import checkOutput, printScorecards
+from plateball.qrcache import QRCodeCache
+
+
+class PrintGamesCommand(Command):
+    def run(self):
+        if self.args.league is None and self.args.season is None:
+            self.usage("Print games mode needs --league or --season")
+
+        try:
+            checkOutput(self.args.output, self.args.cards_per_file,
+                        self.args.split_league)
+        except ValueError as e:
+            self.usage(str(e))
+
+        if self.args.league is not None:
+            leagues = [self.db.getLeagueById(self.args.league)]
+        else:
+            leagues = list(self.db.getLeagues(self.args.season))
+
+        games = chain.from_iterable(self.nextGames(league)
+                                    for league in leagues)
+        qrCache = QRCodeCache(self.args.qr_cache)
+        files = printScorecards(games, self.args.output, self.args.jobs,
+                                qrCache, self.args.cards_per_file,
+                                self.args.split_league)
+        for filename in files:
+            print(filename)
+
+        return True
+
+    def nextGames(self, league):
+        if self.args.rounds:
+            return self.db.getNextGameRows(league, self.args.count, True)
+        return self.db.iterNextGames(league, self.args.count, rows=True)
+
+
+command = PrintGamesCommand
@@ -0,0 +1,62 @@
+#! /usr/bin/env python3.5
+# Copyright 2017 Gavin Hurlbut
+# vim:ts=4:sw=4:ai:et:si:sts=4
+
+import logging
+
+from plateball.commands import Command
+from plateball.profiling import phase
+from plateball.scorefile import iterScoreRecords
+from plateball.service import validateRecord
+
+logger = logging.getLogger(__name__)
+
+
+class RecordScoresCommand(Command):
+    def run(self):
+        if not self.args.scores:
+            self.usage("Record Scores mode needs --scores")
+
+        chunkSize = self.args.chunk_size
+        if not chunkSize:
+            chunkSize = 1000
+
+        errors = 0
+        records = []
+        recordNums = []
+
+        with open(self.args.scores, "r") as f:
+            for (count, gameData) in iterScoreRecords(f):
+                try:
+                    (gameid, scores) = validateRecord(gameData)
+                except ValueError as e:
+                    logger.warning("Invalid record #%s (%s), skipping" %
+                                   (count, e))
+                    errors += 1
+                    continue
+
+                records.append((gameid, scores))
+                recordNums.append(count)
+                if len(records) >= chunkSize:
+                    errors += self.recordChunk(records, recordNums)
+                    records = []
+                    recordNums = []
+
+        if records:
+            errors += self.recordChunk(records, recordNums)
+
+        return errors
+
+    def recordChunk(self, records, recordNums):
+        errors = 0
+        with phase("ingest"):
+            results = self.db.recordScores(records, self.args.replace)
+        for (recordNum, result) in zip(recordNums, results):
+            if not result:
+                logger.warning("Game in record #%s not recorded, skipping" %
+                               recordNum)
+                errors += 1
+        return errors
+
+
+command = RecordScoresCommand
@@ -0,0 +1,25 @@
+#! /usr/bin/env python3.5
+# Copyright 2017 Gavin Hurlbut
+# vim:ts=4:sw=4:ai:et:si:sts=4
+
+import logging
+
+from plateball.commands import Command
+from plateball.profiling import phase
+
+logger = logging.getLogger(__name__)
+
+
+class RescoreCommand(Command):
+    def run(self):
+        with phase("rescore"):
+            self.db.rescoreSeason(self.args.season)
+
+        if self.args.season is None:
+            logger.info("Rescored every season")
+        else:
+            logger.info("Rescored season %s" % self.args.season)
+        return True
+
+
+command = RescoreCommand
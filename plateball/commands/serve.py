@@ -0,0 +1,29 @@
+#! /usr/bin/env python3.5
+# Copyright 2017 Gavin Hurlbut
+# vim:ts=4:sw=4:ai:et:si:sts=4
+
+from plateball.commands import Command
+from plateball.service import runService, BATCH_SIZE
+
+
+class ServeCommand(Command):
+    def run(self):
+        batchSize = self.args.chunk_size
+        if not batchSize:
+            batchSize = BATCH_SIZE
+
+        handles = None
+        if self.args.tenants:
+            # Imported here so other modes don't pay for it
+            from plateball.database.handles import HandleManager, \
+                MAX_HANDLES
+            handles = HandleManager(self.args.max_tenants or MAX_HANDLES,
+                                    self.db.profile)
+
+        runService(self.db, self.args.host, self.args.port, batchSize,
+                   replace=self.args.replace, handles=handles,
+                   tenantDir=self.args.tenants)
+        return True
+
+
+command = ServeCommand
@@ -0,0 +1,63 @@
+#! /usr/bin/env python3.5
+# Copyright 2017 Gavin Hurlbut
+# vim:ts=4:sw=4:ai:et:si:sts=4
+
+import csv
+import json
+import sys
+
+from plateball.commands import Command
+from plateball.profiling import phase
+from plateball.simulation import playoffOdds, ITERATIONS
+
+SIMULATE_FIELDS = ["league", "team", "plusminus", "remaining", "first"]
+
+
+class SimulateCommand(Command):
+    def run(self):
+        if self.args.league is None and self.args.season is None:
+            self.usage("Simulate mode needs --league or --season")
+
+        season = self.args.season
+        if self.args.league is not None:
+            season = self.db.getLeagueById(self.args.league).season
+
+        iterations = self.args.iterations
+        if iterations is None:
+            iterations = ITERATIONS
+        elif iterations < 1:
+            self.usage("Simulate mode needs --iterations of at least 1")
+
+        with phase("simulate"):
+            odds = playoffOdds(self.db, season, iterations, self.args.seed,
+                               self.args.jobs)
+        if self.args.league is not None:
+            odds = [item for item in odds
+                    if item["league"] == self.args.league]
+
+        if self.args.format == "json":
+            json.dump({"season": season, "iterations": iterations,
+                       "odds": odds}, sys.stdout, indent=2)
+            print()
+            return True
+
+        if self.args.format == "csv":
+            writer = csv.DictWriter(sys.stdout, fieldnames=SIMULATE_FIELDS)
+            writer.writeheader()
+            writer.writerows(odds)
+            return True
+
+        print("Chances of finishing first, season %s (%s simulations)" %
+              (season, iterations))
+        print("%6s %4s %5s %5s %7s" % ("League", "Team", "+/-", "Left",
+                                        "First"))
+        print("---------------------------------")
+        for item in odds:
+            print("%6s %4s %5s %5s %6.1f%%" %
+                  (item['league'], item['team'], item['plusminus'],
+                   item['remaining'], 100.0 * item['first']))
+
+        return True
+
+
+command = SimulateCommand
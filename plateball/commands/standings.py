@@ -0,0 +1,47 @@
+#! /usr/bin/env python3.5
+# Copyright 2017 Gavin Hurlbut
+# vim:ts=4:sw=4:ai:et:si:sts=4
+
+import csv
+import json
+import sys
+
+from plateball.commands import Command
+from plateball.database.access import STANDINGS_FIELDS
+from plateball.profiling import phase
+
+
+class StandingsCommand(Command):
+    def run(self):
+        if self.args.league is None:
+            self.usage("Standings mode needs --league")
+
+        league = self.db.getLeagueById(self.args.league)
+        with phase("standings_query"):
+            scores = self.db.getStandingsData(league)
+
+        if self.args.format == "json":
+            json.dump({"league": league.id, "standings": scores}, sys.stdout,
+                      indent=2)
+            print()
+            return True
+
+        if self.args.format == "csv":
+            writer = csv.DictWriter(sys.stdout, fieldnames=STANDINGS_FIELDS)
+            writer.writeheader()
+            writer.writerows(scores)
+            return True
+
+        print("Standings for league #%s" % self.args.league)
+        print("%4s %4s %4s %5s %5s %s" % ("Team", "W", "L", "RF", "RA", "GB"))
+        print("---------------------------------")
+        for score in scores:
+            print("%4s %4s %4s %5s %5s %s" %
+                  (score['team'], score['wins'], score['losses'],
+                   score['runs_for'], score['runs_against'],
+                   score['gamesbehind']))
+
+        return True
+
+
+command = StandingsCommand
@@ -0,0 +1,81 @@
+#! /usr/bin/env python3.5
+# Copyright 2017 Gavin Hurlbut
+# vim:ts=4:sw=4:ai:et:si:sts=4
+
+import csv
+import json
+import sys
+
+from plateball.commands import Command
+from plateball.profiling import phase
+from plateball.stats import seasonStats
+
+SPLIT_FIELDS = ["league", "team", "home_wins", "home_losses", "home_runs_for",
+                "home_runs_against", "away_wins", "away_losses",
+                "away_runs_for", "away_runs_against"]
+
+
+class StatsCommand(Command):
+    def run(self):
+        league = None
+        season = self.args.season
+        if self.args.league is not None:
+            league = self.db.getLeagueById(self.args.league)
+            season = league.season
+
+        with phase("stats"):
+            stats = seasonStats(self.db, season, league)
+
+        if self.args.format == "json":
+            stats["season"] = season
+            stats["league"] = self.args.league
+            json.dump(stats, sys.stdout, indent=2)
+            print()
+            return True
+
+        if self.args.format == "csv":
+            # Only the per team splits are tabular
+            writer = csv.DictWriter(sys.stdout, fieldnames=SPLIT_FIELDS)
+            writer.writeheader()
+            writer.writerows(stats["teams"])
+            return True
+
+        if league is not None:
+            print("Inning stats for league #%s" % league.id)
+        elif season is not None:
+            print("Inning stats for season %s" % season)
+        else:
+            print("Inning stats for all seasons")
+        print("%s games, %.1f%% extra innings, %.1f%% walk-offs, "
+              "%.1f%% home wins" %
+              (stats["games"], 100.0 * stats["extra_innings"],
+               100.0 * stats["walk_offs"], 100.0 * stats["home_wins"]))
+        print()
+        print("%6s %6s %6s %6s %6s" % ("Inning", "Away", "Home", "Halves",
+                                       "Scored"))
+        print("---------------------------------")
+        for item in stats["innings"]:
+            halves = item["away"]["halves"] + item["home"]["halves"]
+            scoreless = item["away"]["runs"][0] + item["home"]["runs"][0]
+            scored = 100.0 * (halves - scoreless) / halves if halves else 0.0
+            print("%6s %6.2f %6.2f %6s %5.1f%%" %
+                  (item["inning"], item["away"]["mean"],
+                   item["home"]["mean"], halves, scored))
+        print()
+        print("%6s %4s %7s %9s %7s %9s" % ("League", "Team", "Home", "RF-RA",
+                                            "Away", "RF-RA"))
+        print("----------------------------------------------")
+        for item in stats["teams"]:
+            print("%6s %4s %7s %9s %7s %9s" %
+                  (item["league"], item["team"],
+                   "%s-%s" % (item["home_wins"], item["home_losses"]),
+                   "%s-%s" % (item["home_runs_for"],
+                              item["home_runs_against"]),
+                   "%s-%s" % (item["away_wins"], item["away_losses"]),
+                   "%s-%s" % (item["away_runs_for"],
+                              item["away_runs_against"])))
+
+        return True
+
+
+command = StatsCommand
@@ -0,0 +1,18 @@
+#! /usr/bin/env python3.5
+# Copyright 2017 Gavin Hurlbut
+# vim:ts=4:sw=4:ai:et:si:sts=4
+
+from plateball.commands import Command
+
+
+class TeamsCommand(Command):
+    def run(self):
+        if self.args.league is None or not self.args.teams:
+            self.usage("Teams mode needs --league and --teams")
+
+        teams = [item.upper() for item in self.args.teams]
+        league = self.db.getLeagueById(self.args.league)
+        return self.db.createTeams(league, teams)
+
+
+command = TeamsCommand
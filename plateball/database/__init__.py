@@ -3,13 +3,50 @@
 # vim:ts=4:sw=4:ai:et:si:sts=4
 
 import logging
+import threading
+from contextlib import contextmanager
 
 from peewee import Model, Proxy, OperationalError, IntegrityError
 from playhouse.pool import PooledSqliteDatabase
+from plateball.database.cache import RowCache
+from plateball.database.storage import loadStorageProfile, databaseOptions
 
 logger = logging.getLogger(__name__)
 
-db_proxy = Proxy()
+
+class BindingProxy(Proxy):
+    """A Proxy each thread can point at a database of its own.
+
+    bind() and unbind() push and pop the calling thread's database; a
+    thread with nothing bound falls back to the one given to initialize().
+    This lets one process keep several databases open for the same
+    models."""
+    __slots__ = ("local",)
+
+    def __init__(self):
+        object.__setattr__(self, "local", threading.local())
+        Proxy.__init__(self)
+
+    def __setattr__(self, attr, value):
+        object.__setattr__(self, attr, value)
+
+    def __getattr__(self, attr):
+        stack = getattr(self.local, "stack", None)
+        database = stack[-1] if stack else self.obj
+        if database is None:
+            raise AttributeError("Cannot use uninitialized Proxy.")
+        return getattr(database, attr)
+
+    def bind(self, database):
+        if not hasattr(self.local, "stack"):
+            self.local.stack = []
+        self.local.stack.append(database)
+
+    def unbind(self):
+        self.local.stack.pop()
+
+
+db_proxy = BindingProxy()
 
 
 class BaseModel(Model):
@@ -23,17 +60,53 @@ class BaseModel(Model):
                  for attr in self.fields}
         return str(attrs)
 
+    def save(self, *args, **kwargs):
+        result = Model.save(self, *args, **kwargs)
+        self.uncache()
+        return result
+
+    def delete_instance(self, *args, **kwargs):
+        result = Model.delete_instance(self, *args, **kwargs)
+        self.uncache()
+        return result
+
+    def uncache(self):
+        """Drop this row from its database's row cache, if it has one"""
+        rowCache = getattr(self._meta.database, "rowCache", None)
+        if rowCache is not None:
+            rowCache.invalidate(type(self), [self._get_pk_value()])
+
 
 class Database(object):
-    def __init__(self, filename, tables, foreign_keys=None):
+    databaseClass = PooledSqliteDatabase
+
+    def __init__(self, filename, tables, foreign_keys=None, migrations=None,
+                 profile=None, default=True):
+        """Open (creating and migrating as needed) a database.  With default
+        set it also becomes the models' database for threads that haven't
+        bound one with bind()."""
         self.filename = filename
-        maxConn = 50
-        timeout = 600
-        self.db = PooledSqliteDatabase(self.filename, max_connections=maxConn,
-                                      stale_timeout=timeout)
-        db_proxy.initialize(self.db)
+        if profile is None:
+            profile = loadStorageProfile()
+        self.profile = profile
+        self.db = self.databaseClass(self.filename,
+                                     **databaseOptions(profile))
+        # Kept on the peewee database so model saves can find it
+        self.rowCache = RowCache(profile["row_cache_size"])
+        self.db.rowCache = self.rowCache
+        if default:
+            db_proxy.initialize(self.db)
 
         logger.info("Connecting to database %s" % self.filename)
+        logger.debug("Storage profile: %s" % profile)
+        with self.bind():
+            self.createTables(tables, foreign_keys)
+            if migrations:
+                # Imported here as migrations.py builds on BaseModel
+                from plateball.database.migrations import runMigrations
+                runMigrations(self.db, migrations)
+
+    def createTables(self, tables, foreign_keys=None):
         self.db.connect()
         self.db.create_tables(tables, safe=True)
         if foreign_keys:
@@ -52,11 +125,46 @@ class Database(object):
                     logger.exception(exceptionDetails(e))
         self.db.close()
 
+    @contextmanager
+    def bind(self):
+        """Point the models at this database in the calling thread"""
+        db_proxy.bind(self.db)
+        try:
+            yield self
+        finally:
+            db_proxy.unbind()
+
+    @contextmanager
     def execution_context(self):
-        return self.db.execution_context()
+        with self.bind(), self.db.execution_context():
+            yield
+
+    def warm(self):
+        """Open a pooled connection ahead of the first query"""
+        with self.execution_context():
+            pass
+
+    def close(self):
+        """Close the pooled connections not in use"""
+        self.db.close_all()
+
+    def analyze(self):
+        """Refresh SQLite's statistics so the planner uses the indexes"""
+        logger.info("Analyzing database %s" % self.filename)
+        with self.execution_context():
+            self.db.execute_sql("ANALYZE")
+
+    def getCached(self, model, rowid):
+        """Fetch a row by primary key through the row cache"""
+        instance = self.rowCache.get(model, rowid)
+        if instance is None:
+            with self.bind():
+                instance = model.get(model._meta.primary_key == rowid)
+            self.rowCache.put(instance)
+        return instance
 
     def bulkSave(self, objList, ignoreDupes=False):
-        with self.db.execution_context():
+        with self.execution_context():
             for obj in objList:
                 try:
                     obj.save()
@@ -69,7 +177,7 @@ class Database(object):
                     pass
 
     def get_or_create_save(self, klass, item):
-        with self.db.execution_context():
+        with self.execution_context():
             (dbitem, created) = klass.get_or_create(**item)
             if created:
                 dbitem.save()
@@ -3,18 +3,259 @@
 # vim:ts=4:sw=4:ai:et:si:sts=4
 
 import logging
-from random import shuffle
+import os
+import time
+from collections import namedtuple
+from peewee import fn, SQL
 from plateball.database import Database
+from plateball.database.migrations import MIGRATIONS
+from plateball.database.partition import PartitionedSqliteDatabase, \
+    storageLayout, partitionFilename, createPartition, freezePartition, \
+    removePartition
 from plateball.database.schema import *
-from plateball.singleton import Singleton
+from plateball.database.storage import loadStorageProfile
+from plateball.scheduler import scheduleSeason
 
 logger = logging.getLogger(__name__)
 
-class PlateballDatabase(Database, Singleton):
-    def __init__(self, filename):
-        tables = [League, Team, Game, Inning]
+# SQLite caps bound parameters per statement (999 on older builds)
+SELECT_CHUNK = 500
+INSERT_CHUNK = 200
+PAGE_SIZE = 500
+
+# Read-only report rows, flattened from joined queries without building
+# model instances.  GameRow is what the scorecard printer takes.
+StandingRow = namedtuple("StandingRow", ["team", "wins", "losses",
+                                         "plusminus", "runs_for",
+                                         "runs_against", "games_behind"])
+GameRow = namedtuple("GameRow", ["id", "league", "away", "home"])
+# Keys of the standings dicts reported by the CLI and the service
+STANDINGS_FIELDS = ["team", "wins", "losses", "plusminus", "runs_for",
+                    "runs_against", "gamesbehind"]
+
+# Each team's record summed from its completed games, for the teams picked
+# out by a subquery
+TEAM_TOTALS = \
+    "SELECT team_id, SUM(win) AS wins, SUM(1 - win) AS losses, " \
+    "SUM(runs_for) AS runs_for, SUM(runs_against) AS runs_against FROM (" \
+    "SELECT home_team_id AS team_id, runs_home > runs_away AS win, " \
+    "runs_home AS runs_for, runs_away AS runs_against " \
+    "FROM game WHERE complete = 1 " \
+    "UNION ALL " \
+    "SELECT away_team_id, runs_away > runs_home, runs_away, runs_home " \
+    "FROM game WHERE complete = 1) " \
+    "WHERE team_id IN (%s) GROUP BY team_id"
+SEASON_TEAMS = "SELECT team.id FROM team JOIN league " \
+    "ON team.league_id = league.id WHERE league.season = ?"
+
+
+def chunked(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def tallyInnings(data):
+    """Apply the inning and walk-off rules to a list of [away, home] scores.
+
+    Returns (innings, runs_home, runs_away, complete) where innings is a list
+    of (inning, runs_home, runs_away) tuples up to the end of the game."""
+    runs_home = 0
+    runs_away = 0
+    innings = []
+    complete = False
+    for (inning, score) in enumerate(data):
+        away = score[0]
+        if inning < 8 or runs_home <= runs_away:
+            # Remember, enumerate starts at 0, this is inning 9+
+            home = score[1]
+        else:
+            home = 0
+
+        innings.append((inning + 1, home, away))
+
+        runs_home += home
+        runs_away += away
+
+        if inning >= 8 and runs_home != runs_away:
+            # Fat lady has sung, game over
+            complete = True
+            break
+
+    return (innings, runs_home, runs_away, complete)
+
+
+class PlateballDatabase(Database):
+    """A plateball.db file and, when partitioned, its season files.
+
+    With more than one database open (see handles.HandleManager), use the
+    queries a handle returns inside "with handle.bind():"; the methods that
+    run queries themselves bind on their own."""
+    databaseClass = PartitionedSqliteDatabase
+
+    def __init__(self, filename, profile=None, default=True):
+        if profile is None:
+            profile = loadStorageProfile()
+
+        # An existing file keeps its layout, the profile picks a new one's
+        layout = storageLayout(filename)
+        if layout is None:
+            self.partitioned = profile["partitioned"]
+        else:
+            self.partitioned = layout == "partitioned"
+        if profile["partitioned"] and not self.partitioned:
+            raise ValueError("%s holds every season in one file; export the "
+                             "seasons and import them into a new "
+                             "partitioned database" % filename)
+
+        tables = [League, Team, Standing]
+        if self.partitioned:
+            tables.append(Partition)
+        else:
+            tables.extend([Game, Inning])
         foreignKeys = {}
-        Database.__init__(self, filename, tables, foreignKeys)
+        Database.__init__(self, filename, tables, foreignKeys, MIGRATIONS,
+                          profile, default)
+
+        self.activeSeason = None
+        # Seasons whose team records checkSeason has found in step
+        self.checkedSeasons = set()
+        # Log every recorded game inning by inning
+        self.verbose = False
+        if self.partitioned:
+            with self.execution_context():
+                latest = Partition.select() \
+                    .order_by(Partition.readonly, Partition.season.desc()) \
+                    .first()
+            if latest:
+                self.useSeason(latest.season)
+
+        self.syncStandings()
+
+    def warm(self):
+        """Open a pooled connection and load the leagues, which every
+        command and request looks up by id, into the row cache"""
+        with self.execution_context():
+            for row in League.select().limit(self.rowCache.size):
+                self.rowCache.put(row)
+
+    def seasonFilename(self, season):
+        return partitionFilename(self.filename, season)
+
+    def useSeason(self, season, create=False):
+        """Route game and inning queries to a season's file.
+
+        Returns False if the season has no file yet (and create is False).
+        Does nothing for a single file database.  Call outside any
+        transaction, as connections are reopened."""
+        if not self.partitioned:
+            return True
+        if season == self.activeSeason:
+            return True
+
+        with self.execution_context():
+            partition = Partition.select() \
+                .where(Partition.season == season).first()
+            if partition is None:
+                if not create:
+                    return False
+                filename = self.seasonFilename(season)
+                createPartition(filename, [Game, Inning],
+                                self.profile["journal_mode"])
+                partition = Partition.create(
+                    season=season, filename=os.path.basename(filename),
+                    readonly=False)
+                logger.info("Created %s for season %s" % (filename, season))
+
+        filename = os.path.join(os.path.dirname(self.filename),
+                                partition.filename)
+        self.db.attach(filename, partition.readonly)
+        self.activeSeason = season
+        return True
+
+    def checkSeason(self, season):
+        """Rescore the attached season if its team records don't add up to
+        its games.
+
+        Under WAL, recordScores commits the games to the season file and the
+        team records to the main file separately, so a crash in between
+        leaves them disagreeing.  The games are taken as the truth.  This
+        scans the whole season, so it runs before the first write to a
+        season rather than on every attach, and only once per season."""
+        if not self.partitioned or season is None or \
+                season in self.checkedSeasons:
+            return True
+
+        with self.execution_context():
+            cursor = self.db.execute_sql(
+                "SELECT COUNT(*) FROM team LEFT JOIN (" +
+                TEAM_TOTALS % SEASON_TEAMS + ") AS totals "
+                "ON totals.team_id = team.id "
+                "WHERE team.id IN (" + SEASON_TEAMS + ") AND ("
+                "team.wins != COALESCE(totals.wins, 0) OR "
+                "team.losses != COALESCE(totals.losses, 0) OR "
+                "team.runs_for != COALESCE(totals.runs_for, 0) OR "
+                "team.runs_against != COALESCE(totals.runs_against, 0))",
+                (season, season))
+            mismatched = cursor.fetchone()[0]
+        if mismatched:
+            logger.warning("%s teams in season %s disagree with its games, "
+                           "rescoring" % (mismatched, season))
+            self.rescore(season, False)
+        self.checkedSeasons.add(season)
+        return not mismatched
+
+    def freezeSeason(self, season):
+        """Make a season's file read-only"""
+        if not self.partitioned or not self.useSeason(season):
+            raise ValueError("Season %s has no file of its own" % season)
+        self.checkSeason(season)
+
+        self.db.attach(None)
+        self.activeSeason = None
+        with self.execution_context():
+            Partition.update(readonly=True) \
+                .where(Partition.season == season).execute()
+        freezePartition(self.seasonFilename(season))
+        self.useSeason(season)
+
+    def updatePartition(self):
+        """Record the active season's game id range.  Call inside a
+        transaction."""
+        if self.activeSeason is None:
+            return
+        (first, last) = Game.select(fn.MIN(Game.id), fn.MAX(Game.id)) \
+            .tuples().get()
+        Partition.update(first_game=first, last_game=last) \
+            .where(Partition.season == self.activeSeason).execute()
+
+    def gameIdsTaken(self, low, high):
+        """Whether any game id from low to high is in use, in any season"""
+        if not self.partitioned:
+            return Game.select() \
+                .where(Game.id >= low, Game.id <= high).exists()
+        return Partition.select() \
+            .where(Partition.first_game <= high,
+                   Partition.last_game >= low).exists()
+
+    def nextGameId(self):
+        if not self.partitioned:
+            return (Game.select(fn.MAX(Game.id)).scalar() or 0) + 1
+        return (Partition.select(fn.MAX(Partition.last_game)).scalar() or
+                0) + 1
+
+    def partitionSeasons(self):
+        """Seasons with a games file of their own, in order"""
+        if not self.partitioned:
+            return []
+        with self.execution_context():
+            return [row[0] for row in Partition.select(Partition.season)
+                    .order_by(Partition.season).tuples()]
 
     def createLeague(self, name, season):
         item = {
@@ -22,165 +263,578 @@ class PlateballDatabase(Database, Singleton):
             "season": season,
         }
         league = League(**item)
-        league.save()
+        with self.bind():
+            league.save()
         return league
 
     def createTeams(self, league, teams):
         success = True
-        for name in teams:
-            item = {
-                "team": name,
-                "league": league,
-                "wins": 0,
-                "losses": 0,
-                "runs_for": 0,
-                "runs_against": 0,
-            }
-            team = Team(**item)
-            team.save()
+        with self.execution_context():
+            for name in teams:
+                item = {
+                    "team": name,
+                    "league": league,
+                    "wins": 0,
+                    "losses": 0,
+                    "runs_for": 0,
+                    "runs_against": 0,
+                }
+                team = Team(**item)
+                team.save()
+                team = Team.get(Team.team == name, Team.league == league)
+                Standing.create(team=team, league=league, wins=0, losses=0,
+                                plusminus=0, runs_for=0, runs_against=0,
+                                games_behind=0.0)
+            self.refreshGamesBehind([league.id])
 
         return success
 
-    def createGames(self, season):
-        leagues = self.getLeagues(season)
-        
-        games = {league.name: [] for league in leagues}
-        
+    def createGames(self, season, chunkSize=INSERT_CHUNK, seed=None):
+        """Generate the season's games, returning a count per league name.
+
+        The schedule streams from scheduleSeason() as balanced rounds
+        (reproducible if seed is given) and is written with insert_many in
+        chunkSize row batches inside a single transaction.  Games are
+        counted against the home team's league.  A partitioned database
+        writes them to the season's file, numbered after every other
+        season's games so game ids stay unique."""
+        self.useSeason(season, create=True)
+        leagues = list(self.getLeagues(season))
+        teamLeague = {}
+        leagueTeams = []
         for league in leagues:
-            leagueTeams = league.teams
-            nonLeagueTeams = self.getNonLeagueTeams(league)
+            teams = [team.id for team in league.teams.order_by(Team.id)]
+            teamLeague.update({team: league.name for team in teams})
+            leagueTeams.append(teams)
 
-            for team1 in leagueTeams:
-                gameList = games[team1.league.name]
-                for team2 in leagueTeams:
-                    if team2 == team1:
-                        continue
-                    gameItem = {
-                        "home_team": team1,
-                        "away_team": team2,
+        counts = {league.name: 0 for league in leagues}
+        nextId = [None]
+
+        def rows():
+            for (roundNum, pairs) in scheduleSeason(leagueTeams, seed):
+                for (home, away) in pairs:
+                    counts[teamLeague[home]] += 1
+                    row = {
+                        "home_team": home,
+                        "away_team": away,
+                        "runs_home": 0,
+                        "runs_away": 0,
+                        "complete": 0,
+                        "round": roundNum,
                     }
-                    gameList.append(gameItem)
-                    gameList.append(gameItem)
-                    gameList.append(gameItem)
-                    gameList.append(gameItem)
+                    if nextId[0] is not None:
+                        row["id"] = nextId[0]
+                        nextId[0] += 1
+                    yield row
 
-                for team2 in nonLeagueTeams:
-                    if team2 == team1:
-                        continue
+        with self.execution_context():
+            if self.partitioned:
+                nextId[0] = max(self.nextGameId(),
+                                (Game.select(fn.MAX(Game.id)).scalar() or
+                                 0) + 1)
+            for chunk in chunked(rows(), chunkSize):
+                Game.insert_many(chunk).execute()
+            if self.partitioned:
+                self.updatePartition()
 
-                    gameItem = {
-                        "home_team": team1,
-                        "away_team": team2,
-                    }
-                    gamelist.append(gameItem)
-                    games[team2.league.name].append(gameItem)
-
-        for (leagueName, gameList) in games.items():
-            shuffle(gameList)
-            for item in gameList:
-                item.update({
-                    "runs_home": 0,
-                    "runs_away": 0,
-                    "complete": 0,
-                })
-                game = Game(**item)
-                with self.execution_context():
-                    game.save()
+        for league in leagues:
+            logger.info("Inserted %s games for league %s" %
+                        (counts[league.name], league.name))
 
+        return counts
 
     def getLeagues(self, season):
-        query = League.select().where(League.season == season)
+        query = League.select().where(League.season == season) \
+            .order_by(League.id)
         return query
 
 
     def getNonLeagueTeams(self, league):
         query = Team.select().join(League)\
             .where(League.season == league.season,
-                   Team.league != league.id)
+                   Team.league != league.id) \
+            .order_by(Team.id)
         return query
 
-    def getNextGames(self, league, limit):
+    def getNextGames(self, league, limit, rounds=False, after=None):
+        """Outstanding games for a league's home teams.
+
+        Games come in id order; pass the last id seen as after to fetch the
+        following page without an OFFSET scan.  With rounds set, limit
+        counts whole scheduled rounds rather than games."""
         HomeTeam = Team.alias()
         AwayTeam = Team.alias()
         query = Game.select(Game, HomeTeam, AwayTeam, League) \
-            .join(HomeTeam, on=HomeTeam.home_games) \
+            .join(HomeTeam,
+                  on=(Game.home_team == HomeTeam.id).alias("home_team")) \
             .join(League) \
             .switch(Game) \
-            .join(AwayTeam, on=AwayTeam.away_games) \
-            .where(League.id == league.id,
-                   Game.complete == 0).limit(limit)
-        return query
+            .join(AwayTeam,
+                  on=(Game.away_team == AwayTeam.id).alias("away_team"))
+        return self.nextGamesQuery(query, HomeTeam, league, limit, rounds,
+                                   after)
+
+    def getNextGameRows(self, league, limit, rounds=False, after=None):
+        """getNextGames as GameRow tuples"""
+        HomeTeam = Team.alias()
+        AwayTeam = Team.alias()
+        query = Game.select(Game.id, HomeTeam.league, AwayTeam.team,
+                            HomeTeam.team) \
+            .join(HomeTeam, on=(Game.home_team == HomeTeam.id)) \
+            .switch(Game) \
+            .join(AwayTeam, on=(Game.away_team == AwayTeam.id))
+        query = self.nextGamesQuery(query, HomeTeam, league, limit, rounds,
+                                    after)
+        return map(GameRow._make, query.tuples().iterator())
+
+    def nextGamesQuery(self, query, HomeTeam, league, limit, rounds, after):
+        """Narrow a query joining Game to HomeTeam down to the league's
+        outstanding games, paged or by rounds"""
+        self.useSeason(league.season)
+        query = query.where(HomeTeam.league == league.id,
+                            Game.complete == 0)
+
+        if not rounds:
+            if after is not None:
+                query = query.where(Game.id > after)
+            return query.order_by(Game.id).limit(limit)
+
+        nextRounds = Game.select(Game.round).distinct() \
+            .join(Team, on=(Game.home_team == Team.id)) \
+            .where(Team.league == league.id,
+                   Game.complete == 0,
+                   Game.round.is_null(False)) \
+            .order_by(Game.round).limit(limit)
+        return query.where(Game.round << nextRounds) \
+            .order_by(Game.round, Game.id)
+
+    def iterNextGames(self, league, limit=None, pageSize=PAGE_SIZE,
+                      rows=False):
+        """Walk up to limit outstanding games (all if None) a page at a
+        time, keyed on the last game id of each page.  With rows set the
+        games are GameRow tuples."""
+        fetch = self.getNextGameRows if rows else self.getNextGames
+        after = None
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = pageSize
+            if remaining is not None:
+                size = min(size, remaining)
+                remaining -= size
+
+            page = list(fetch(league, size, after=after))
+            for game in page:
+                yield game
+            if len(page) < size:
+                return
+            after = page[-1].id
 
     def recordScore(self, gameid, data):
-        game = self.getGameById(gameid)
-        runs_home = 0
-        runs_away = 0
+        return self.recordScores([(gameid, data)])[0]
+
+    def echoScore(self, gameid, data, innings, runs_home, runs_away):
+        logger.info("Game %s" % gameid)
+        for (inning, home, away) in innings:
+            logger.info("%s %s" % (inning, data[inning - 1]))
+        logger.info("Total:  %s - %s" % (runs_away, runs_home))
+
+    def recordScores(self, records, replace=False):
+        """Record a batch of (gameid, scores) pairs in a single transaction.
+        A partitioned database looks the games up in the active season,
+        checking its team records first (see checkSeason).
+
+        Resubmitting a game that is already complete is a no-op if the
+        final score matches and an error if it doesn't, unless replace is
+        set; then the old result comes off the team records and the innings
+        are overwritten.  Returns a list of booleans, one per record, in
+        input order.  Logs one summary line per batch."""
+        start = time.perf_counter()
+        results = []
         innings = []
-        complete = False
-        print("Game %s" % gameid)
-        for (inning, score) in enumerate(data):
-            print(inning + 1, score)
-            away = score[0]
-            if inning < 8 or runs_home <= runs_away:
-                # Remember, enumerate starts at 0, this is inning 9+
-                home = score[1]
+        teamDeltas = {}
+        seen = set()
+        replaced = {}
+        unchanged = 0
+
+        def addDelta(teamid, runsFor, runsAgainst, sign=1):
+            delta = teamDeltas.setdefault(teamid, [0, 0, 0, 0])
+            if runsFor > runsAgainst:
+                delta[0] += sign
             else:
-                home = 0
-
-            item = {
-                "game": game,
-                "inning": inning + 1,
-                "runs_home": home,
-                "runs_away": away,
-            }
-            newInning = Inning(**item)
-            innings.append(newInning)
-
-            runs_home += home
-            runs_away += away
-
-            if inning >= 8 and runs_home != runs_away:
-                # Fat lady has sung, game over
-                complete = True
-                break
-
-        if complete:
-            game.complete = True
-            game.runs_home = runs_home
-            game.runs_away = runs_away
-            print("Total:  %s - %s\n" % (runs_away, runs_home))
-
-            homeTeam = game.home_team
-            homeTeam.runs_for += runs_home
-            homeTeam.runs_against += runs_away
-            if runs_home > runs_away:
-                homeTeam.wins += 1
+                delta[1] += sign
+            delta[2] += sign * runsFor
+            delta[3] += sign * runsAgainst
+
+        self.checkSeason(self.activeSeason)
+        with self.execution_context():
+            games = self.getGameStates([gameid for (gameid, data) in records])
+
+            for (gameid, data) in records:
+                state = games.get(gameid, None)
+                if state is None:
+                    logger.error("No such game (id %s)" % gameid)
+                    results.append(False)
+                    continue
+
+                if gameid in seen:
+                    logger.error("Duplicate game in batch (id %s)" % gameid)
+                    results.append(False)
+                    continue
+
+                (gameInnings, runs_home, runs_away, complete) = \
+                    tallyInnings(data)
+                if not complete:
+                    logger.error("Game incomplete (id %s)" % gameid)
+                    results.append(False)
+                    continue
+
+                seen.add(gameid)
+                (homeTeam, awayTeam, done, oldHome, oldAway) = state
+                if done:
+                    if not replace:
+                        if (oldHome, oldAway) != (runs_home, runs_away):
+                            logger.error("Game already complete with a "
+                                         "different score (id %s)" % gameid)
+                            results.append(False)
+                        else:
+                            logger.debug("Game already recorded (id %s)" %
+                                         gameid)
+                            results.append(True)
+                            unchanged += 1
+                        continue
+
+                    addDelta(homeTeam, oldHome, oldAway, -1)
+                    addDelta(awayTeam, oldAway, oldHome, -1)
+                    replaced[gameid] = len(gameInnings)
+
+                if self.verbose:
+                    self.echoScore(gameid, data, gameInnings, runs_home,
+                                   runs_away)
+                Game.update(complete=True, runs_home=runs_home,
+                            runs_away=runs_away) \
+                    .where(Game.id == gameid).execute()
+                innings.extend([{
+                        "game": gameid,
+                        "inning": inning,
+                        "runs_home": home,
+                        "runs_away": away,
+                    } for (inning, home, away) in gameInnings])
+                addDelta(homeTeam, runs_home, runs_away)
+                addDelta(awayTeam, runs_away, runs_home)
+                results.append(True)
+
+            # Upsert on the unique (game, inning) index, then drop any
+            # extra innings a replaced game no longer has
+            for chunk in chunked(innings, INSERT_CHUNK):
+                Inning.insert_many(chunk).upsert().execute()
+            for (gameid, count) in replaced.items():
+                Inning.delete().where(Inning.game == gameid,
+                                      Inning.inning > count).execute()
+
+            self.applyTeamDeltas(teamDeltas)
+
+        rejected = results.count(False)
+        counters = {
+            "games": len(results) - rejected - unchanged,
+            "unchanged": unchanged,
+            "rejected": rejected,
+            "innings": len(innings),
+            "elapsed": round(time.perf_counter() - start, 6),
+        }
+        logger.info("Recorded %(games)s games (%(unchanged)s unchanged, "
+                    "%(rejected)s rejected), %(innings)s innings in "
+                    "%(elapsed).3fs" % counters, extra=counters)
+        return results
+
+    def applyTeamDeltas(self, teamDeltas):
+        """Add {teamid: [wins, losses, runs_for, runs_against]} to the teams
+        and their standings rows.  Call inside a transaction."""
+        for (teamid, delta) in teamDeltas.items():
+            (wins, losses, runsFor, runsAgainst) = delta
+            Team.update(wins=Team.wins + wins,
+                        losses=Team.losses + losses,
+                        runs_for=Team.runs_for + runsFor,
+                        runs_against=Team.runs_against + runsAgainst) \
+                .where(Team.id == teamid).execute()
+            Standing.update(wins=Standing.wins + wins,
+                            losses=Standing.losses + losses,
+                            plusminus=Standing.plusminus + wins - losses,
+                            runs_for=Standing.runs_for + runsFor,
+                            runs_against=Standing.runs_against + runsAgainst) \
+                .where(Standing.team == teamid).execute()
+
+        if teamDeltas:
+            self.rowCache.invalidate(Team, teamDeltas.keys())
+            leagues = Team.select(Team.league).distinct() \
+                .where(Team.id << list(teamDeltas.keys()))
+            self.refreshGamesBehind(leagues)
+
+    def refreshGamesBehind(self, leagues=None):
+        """Recompute games behind for the given leagues (a query or list of
+        league ids), or for every league"""
+        Leader = Standing.alias()
+        top = Leader.select(fn.MAX(Leader.plusminus)) \
+            .where(Leader.league == Standing.league)
+        query = Standing.update(
+            games_behind=(fn.COALESCE(top, 0) - Standing.plusminus) / 2.0)
+        if leagues is not None:
+            query = query.where(Standing.league << leagues)
+        query.execute()
+
+    def rebuildStandings(self, leagues=None):
+        """Repopulate the standings table from the team records"""
+        with self.execution_context():
+            self.populateStandings(leagues)
+
+    def populateStandings(self, leagues=None):
+        """Replace the standings rows of the given leagues (a query or list
+        of league ids), or of every league.  Call inside a transaction."""
+        delete = Standing.delete()
+        query = Team.select(Team.id, Team.league, Team.wins,
+                            Team.losses, Team.wins - Team.losses,
+                            Team.runs_for, Team.runs_against,
+                            SQL("0.0"))
+        if leagues is not None:
+            delete = delete.where(Standing.league << leagues)
+            query = query.where(Team.league << leagues)
+
+        delete.execute()
+        Standing.insert_from(
+            [Standing.team, Standing.league, Standing.wins,
+             Standing.losses, Standing.plusminus, Standing.runs_for,
+             Standing.runs_against, Standing.games_behind],
+            query).execute()
+        self.refreshGamesBehind(leagues)
+
+    def rescoreSeason(self, season=None):
+        """Rebuild team records from the recorded games for one season, or
+        for every season, then repopulate their standings.  Game totals are
+        first resummed from the innings, except in read-only seasons."""
+        if not self.partitioned:
+            self.rescore(season, True)
+            return
+
+        if season is None:
+            with self.execution_context():
+                seasons = [row[0] for row in League.select(League.season)
+                           .distinct().order_by(League.season).tuples()]
+        else:
+            seasons = [season]
+        for season in seasons:
+            if self.useSeason(season):
+                with self.execution_context():
+                    readonly = Partition.select(Partition.readonly) \
+                        .where(Partition.season == season).scalar()
+                self.rescore(season, not readonly)
             else:
-                homeTeam.losses += 1
+                # No games file, so no games played
+                with self.execution_context():
+                    leagues = League.select(League.id) \
+                        .where(League.season == season)
+                    Team.update(wins=0, losses=0, runs_for=0,
+                                runs_against=0) \
+                        .where(Team.league << leagues).execute()
+                    self.populateStandings(leagues)
+                self.rowCache.invalidate(Team)
 
-            awayTeam = game.away_team
-            awayTeam.runs_for += runs_away
-            awayTeam.runs_against += runs_home
-            if runs_away > runs_home:
-                awayTeam.wins += 1
+    def rescore(self, season, fixGames):
+        """One set based pass: resum game totals from the innings, group the
+        completed games by team into a temporary table and copy that over
+        the team records.  A season of None covers every season."""
+        if season is None:
+            teams = "SELECT id FROM team"
+            params = ()
+        else:
+            teams = SEASON_TEAMS
+            params = (season,)
+
+        with self.execution_context():
+            if fixGames:
+                self.db.execute_sql(
+                    "UPDATE game SET "
+                    "runs_home = (SELECT COALESCE(SUM(runs_home), 0) "
+                    "FROM inning WHERE inning.game_id = game.id), "
+                    "runs_away = (SELECT COALESCE(SUM(runs_away), 0) "
+                    "FROM inning WHERE inning.game_id = game.id) "
+                    "WHERE complete = 1 AND home_team_id IN (%s)" % teams,
+                    params)
+
+            self.db.execute_sql(
+                "CREATE TEMP TABLE team_totals AS " +
+                TEAM_TOTALS % teams, params)
+            try:
+                self.db.execute_sql(
+                    "UPDATE team SET " + ", ".join(
+                        "%s = COALESCE((SELECT %s FROM temp.team_totals "
+                        "WHERE team_totals.team_id = team.id), 0)" %
+                        (column, column)
+                        for column in ("wins", "losses", "runs_for",
+                                       "runs_against")) +
+                    " WHERE id IN (%s)" % teams, params)
+            finally:
+                self.db.execute_sql("DROP TABLE temp.team_totals")
+            self.rowCache.invalidate(Team)
+
+            leagues = None
+            if season is not None:
+                leagues = League.select(League.id) \
+                    .where(League.season == season)
+            self.populateStandings(leagues)
+
+    def syncStandings(self):
+        # Databases created before materialized standings need populating
+        with self.execution_context():
+            teams = Team.select().count()
+            standings = Standing.select().count()
+        if teams != standings:
+            logger.info("Rebuilding standings for %s teams" % teams)
+            self.rebuildStandings()
+
+    def getStandings(self, league):
+        """Standings rows with their teams, leader first"""
+        query = Standing.select(Standing, Team) \
+            .join(Team) \
+            .where(Standing.league == league.id) \
+            .order_by(Standing.plusminus.desc(), Team.team)
+        return query
+
+    def getStandingRows(self, league):
+        """getStandings as StandingRow tuples"""
+        query = Standing.select(Team.team, Standing.wins, Standing.losses,
+                                Standing.plusminus, Standing.runs_for,
+                                Standing.runs_against, Standing.games_behind) \
+            .join(Team) \
+            .where(Standing.league == league.id) \
+            .order_by(Standing.plusminus.desc(), Team.team) \
+            .tuples()
+        return map(StandingRow._make, query.iterator())
+
+    def getStandingsData(self, league):
+        """Standings for a league as a list of dicts keyed by
+        STANDINGS_FIELDS"""
+        return [{
+                "team": standing.team,
+                "wins": standing.wins,
+                "losses": standing.losses,
+                "plusminus": standing.plusminus,
+                "runs_for": standing.runs_for,
+                "runs_against": standing.runs_against,
+                "gamesbehind": standing.games_behind,
+            } for standing in self.getStandingRows(league)]
+
+    def getSeasonTeams(self, season):
+        """(id, team, league, wins, losses, runs_for, runs_against) tuples
+        for every team in a season, or in every season if season is None"""
+        query = Team.select(Team.id, Team.team, Team.league, Team.wins,
+                            Team.losses, Team.runs_for, Team.runs_against) \
+            .join(League)
+        if season is not None:
+            query = query.where(League.season == season)
+        return query.order_by(Team.id).tuples()
+
+    def getRemainingGames(self, season):
+        """(home team id, away team id) tuples for a season's outstanding
+        games"""
+        self.useSeason(season)
+        query = Game.select(Game.home_team, Game.away_team) \
+            .join(Team, on=(Game.home_team == Team.id)) \
+            .join(League) \
+            .where(League.season == season,
+                   Game.complete == 0) \
+            .order_by(Game.id) \
+            .tuples()
+        return query
+
+    def completedGames(self, season, league=None, fields=None):
+        """Select fields (default all) of a season's completed games, or of
+        just those involving one league's teams.  A season of None selects
+        every season of a single file database, or just the active season
+        of a partitioned one."""
+        HomeTeam = Team.alias()
+        AwayTeam = Team.alias()
+        query = Game.select(*(fields or [Game])) \
+            .join(HomeTeam, on=(Game.home_team == HomeTeam.id)) \
+            .join(League) \
+            .switch(Game) \
+            .join(AwayTeam, on=(Game.away_team == AwayTeam.id)) \
+            .where(Game.complete == 1)
+        if season is not None:
+            self.useSeason(season)
+            query = query.where(League.season == season)
+        if league is not None:
+            query = query.where((HomeTeam.league == league.id) |
+                                (AwayTeam.league == league.id))
+        return query
+
+    def getCompletedGames(self, season, league=None):
+        """(game id, home team id, away team id) tuples"""
+        return self.completedGames(season, league,
+                                   [Game.id, Game.home_team, Game.away_team]) \
+            .tuples()
+
+    def getCompletedInnings(self, season, league=None):
+        """(game id, inning, runs_home, runs_away) tuples for the innings of
+        the games getCompletedGames returns"""
+        games = self.completedGames(season, league, [Game.id])
+        query = Inning.select(Inning.game, Inning.inning, Inning.runs_home,
+                              Inning.runs_away) \
+            .where(Inning.game << games) \
+            .tuples()
+        return query
+
+    def getGameStates(self, gameids):
+        """Map game id to (home team id, away team id, complete, runs_home,
+        runs_away) for a set of games"""
+        games = {}
+        for chunk in chunked(list(set(gameids)), SELECT_CHUNK):
+            query = Game.select(Game.id, Game.home_team, Game.away_team,
+                                Game.complete, Game.runs_home,
+                                Game.runs_away) \
+                .where(Game.id << chunk).tuples()
+            for (gameid, homeTeam, awayTeam, complete, runsHome,
+                 runsAway) in query:
+                games[gameid] = (homeTeam, awayTeam, bool(complete),
+                                 runsHome, runsAway)
+        return games
+
+    def deleteSeason(self, season):
+        """Remove a season's leagues, teams, standings, games and innings in
+        one transaction, returning the number of games removed.  A
+        partitioned season's file is deleted along with it."""
+        partitioned = self.partitioned and self.useSeason(season)
+        with self.execution_context():
+            leagues = League.select(League.id).where(League.season == season)
+            teams = Team.select(Team.id).where(Team.league << leagues)
+            games = Game.select(Game.id).where(Game.home_team << teams)
+
+            if partitioned:
+                count = games.count()
+                Partition.delete().where(Partition.season == season) \
+                    .execute()
+            elif not self.partitioned:
+                Inning.delete().where(Inning.game << games).execute()
+                count = Game.delete().where(Game.home_team << teams) \
+                    .execute()
             else:
-                awayTeam.losses += 1
+                count = 0
+            Standing.delete().where(Standing.league << leagues).execute()
+            Team.delete().where(Team.league << leagues).execute()
+            League.delete().where(League.season == season).execute()
+        self.rowCache.invalidate(Team)
+        self.rowCache.invalidate(League)
 
-            with self.execution_context():
-                game.save()
-                homeTeam.save()
-                awayTeam.save()
-                for inning in innings:
-                    inning.save()
-            return True
+        if partitioned:
+            self.db.attach(None)
+            self.activeSeason = None
+            removePartition(self.seasonFilename(season))
 
-        logger.error("Game incomplete (id %s)" % gameid)
-        return False
+        logger.info("Deleted season %s (%s games)" % (season, count))
+        return count
 
     def getGameById(self, gameid):
-        query = Game.select().where(Game.id == gameid).get()
+        with self.bind():
+            query = Game.select().where(Game.id == gameid).get()
         return query
 
     def getLeagueById(self, leagueid):
-        query = League.select().where(League.id == leagueid).get()
-        return query
+        return self.getCached(League, leagueid)
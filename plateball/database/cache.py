@@ -0,0 +1,73 @@
+#! /usr/bin/env python3.5
+# Copyright 2017 Gavin Hurlbut
+# vim:ts=4:sw=4:ai:et:si:sts=4
+
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+ROW_CACHE_SIZE = 1024
+
+
+class RowCache(object):
+    """Bounded identity map of (model, primary key) to a model instance.
+
+    Lookups return the same instance until it is saved, deleted or
+    invalidated, with the least recently used rows evicted once size is
+    reached.  Instances are shared, so treat them as read-only unless
+    saving them.  Safe to share between threads."""
+    def __init__(self, size=ROW_CACHE_SIZE):
+        self.size = size
+        self.rows = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, model, rowid):
+        """The cached instance or None, counting the hit or miss"""
+        key = (model, rowid)
+        with self.lock:
+            instance = self.rows.get(key, None)
+            if instance is None:
+                self.misses += 1
+                return None
+            self.rows.move_to_end(key)
+            self.hits += 1
+            return instance
+
+    def put(self, instance):
+        if self.size <= 0:
+            return
+        key = (type(instance), instance._get_pk_value())
+        with self.lock:
+            self.rows[key] = instance
+            self.rows.move_to_end(key)
+            while len(self.rows) > self.size:
+                self.rows.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, model, rowids=None):
+        """Drop some rows of a model, or all of them if rowids is None"""
+        with self.lock:
+            if rowids is None:
+                for key in [key for key in self.rows if key[0] is model]:
+                    del self.rows[key]
+                return
+            for rowid in rowids:
+                self.rows.pop((model, rowid), None)
+
+    def clear(self):
+        with self.lock:
+            self.rows.clear()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "size": len(self.rows),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
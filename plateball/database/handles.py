@@ -0,0 +1,130 @@
+#! /usr/bin/env python3.5
+# Copyright 2017 Gavin Hurlbut
+# vim:ts=4:sw=4:ai:et:si:sts=4
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+from plateball.database.access import PlateballDatabase
+
+logger = logging.getLogger(__name__)
+
+MAX_HANDLES = 16
+
+
+class HandleManager(object):
+    """Open PlateballDatabase handles keyed by path, for one process serving
+    many independent databases.
+
+    Handles open warmed (a pooled connection, leagues cached) and
+    the least recently used one is closed once more than size are open.
+    A handle in use is never closed, so the count can briefly run over.
+    None of them becomes the models' default database; using() binds the
+    handle to the calling thread, so threads can work on different
+    databases at once."""
+    def __init__(self, size=MAX_HANDLES, profile=None):
+        self.size = size
+        self.profile = profile
+        self.handles = OrderedDict()
+        self.users = {}
+        # Futures for handles being opened, keyed like handles
+        self.opening = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.opened = 0
+        self.evictions = 0
+
+    def open(self, filename):
+        handle = PlateballDatabase(filename, self.profile, default=False)
+        handle.warm()
+        return handle
+
+    def acquire(self, filename):
+        """The handle for a database file, opening it if need be.  Pair
+        with release().
+
+        Opening happens outside the lock, so other databases stay usable
+        meanwhile; threads wanting the same file wait for the one opening
+        it."""
+        key = os.path.realpath(filename)
+        while True:
+            with self.lock:
+                handle = self.handles.get(key, None)
+                if handle is not None:
+                    self.handles.move_to_end(key)
+                    self.hits += 1
+                    self.users[key] = self.users.get(key, 0) + 1
+                    return handle
+                opening = self.opening.get(key, None)
+                if opening is None:
+                    opening = Future()
+                    self.opening[key] = opening
+                    break
+            # Raises if that open failed, otherwise look again
+            opening.result()
+
+        try:
+            handle = self.open(key)
+        except BaseException as e:
+            with self.lock:
+                del self.opening[key]
+            opening.set_exception(e)
+            raise
+
+        with self.lock:
+            del self.opening[key]
+            self.handles[key] = handle
+            self.opened += 1
+            self.users[key] = self.users.get(key, 0) + 1
+            self.evict()
+        opening.set_result(handle)
+        return handle
+
+    def release(self, handle):
+        key = os.path.realpath(handle.filename)
+        with self.lock:
+            self.users[key] -= 1
+            self.evict()
+
+    @contextmanager
+    def using(self, filename):
+        """Acquire a handle and bind it to the calling thread"""
+        handle = self.acquire(filename)
+        try:
+            with handle.bind():
+                yield handle
+        finally:
+            self.release(handle)
+
+    def evict(self):
+        # Call with the lock held
+        for key in list(self.handles.keys()):
+            if len(self.handles) <= self.size:
+                break
+            if self.users.get(key, 0):
+                continue
+            handle = self.handles.pop(key)
+            self.users.pop(key, None)
+            handle.close()
+            self.evictions += 1
+            logger.debug("Closed database %s" % key)
+
+    def closeAll(self):
+        with self.lock:
+            for handle in self.handles.values():
+                handle.close()
+            self.handles.clear()
+            self.users.clear()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "open": len(self.handles),
+                "hits": self.hits,
+                "opened": self.opened,
+                "evictions": self.evictions,
+            }
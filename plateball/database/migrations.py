@@ -0,0 +1,111 @@
+#! /usr/bin/env python3.5
+# Copyright 2017 Gavin Hurlbut
+# vim:ts=4:sw=4:ai:et:si:sts=4
+
+import logging
+import time
+
+from peewee import IntegerField, CharField, fn
+from playhouse.migrate import SqliteMigrator, migrate
+from plateball.database import BaseModel
+
+logger = logging.getLogger(__name__)
+
+
+class SchemaVersion(BaseModel):
+    version = IntegerField(primary_key=True)
+    description = CharField()
+    applied = IntegerField()
+
+
+def currentVersion(db):
+    db.create_tables([SchemaVersion], safe=True)
+    version = SchemaVersion.select(fn.MAX(SchemaVersion.version)).scalar()
+    return version or 0
+
+
+def runMigrations(db, migrations):
+    """Apply migrations newer than the recorded schema version, in order.
+
+    migrations is a list of (version, description, function) tuples; each
+    function takes the database and runs inside its own transaction along
+    with the version bump, so a failure leaves the previous version."""
+    with db.execution_context():
+        current = currentVersion(db)
+
+    for (version, description, func) in sorted(migrations,
+                                               key=lambda item: item[0]):
+        if version <= current:
+            continue
+
+        logger.info("Migrating schema to version %s: %s" %
+                    (version, description))
+        with db.execution_context():
+            func(db)
+            SchemaVersion.create(version=version, description=description,
+                                 applied=int(time.time()))
+        current = version
+
+    return current
+
+
+def hasTable(db, table):
+    # Partitioned databases keep games and innings in per-season files,
+    # which are created at the current schema
+    return table in db.get_tables()
+
+
+def addIndex(db, table, columns, unique=False):
+    """Create an index named the way peewee names model indexes"""
+    if not hasTable(db, table):
+        return
+    name = "%s_%s" % (table, "_".join(columns))
+    db.execute_sql('CREATE %sINDEX IF NOT EXISTS "%s" ON "%s" (%s)' %
+                   ("UNIQUE " if unique else "", name, table,
+                    ", ".join('"%s"' % column for column in columns)))
+
+
+def addGameRounds(db):
+    # Databases created before scheduled rounds lack the column
+    if not hasTable(db, "game"):
+        return
+    columns = [column.name for column in db.get_columns("game")]
+    if "round" not in columns:
+        migrator = SqliteMigrator(db)
+        migrate(migrator.add_column("game", "round",
+                                    IntegerField(null=True)))
+    addIndex(db, "game", ["round"])
+
+
+def addGameCompleteIndexes(db):
+    addIndex(db, "game", ["complete", "home_team_id"])
+    addIndex(db, "game", ["complete", "away_team_id"])
+
+
+def addUniqueInnings(db):
+    # Resubmitted score files used to append a second set of innings
+    if not hasTable(db, "inning"):
+        return
+    cursor = db.execute_sql(
+        'DELETE FROM "inning" WHERE "id" NOT IN '
+        '(SELECT MIN("id") FROM "inning" GROUP BY "game_id", "inning")')
+    if cursor.rowcount:
+        logger.warning("Removed %s duplicate innings" % cursor.rowcount)
+    addIndex(db, "inning", ["game_id", "inning"], unique=True)
+
+
+def addTeamLeagueIndex(db):
+    addIndex(db, "team", ["league_id"])
+
+
+def addLeagueSeasonIndex(db):
+    addIndex(db, "league", ["season"])
+
+
+MIGRATIONS = [
+    (1, "Add scheduled round to games", addGameRounds),
+    (2, "Index outstanding games by team", addGameCompleteIndexes),
+    (3, "Unique innings per game", addUniqueInnings),
+    (4, "Index teams by league", addTeamLeagueIndex),
+    (5, "Index leagues by season", addLeagueSeasonIndex),
+]
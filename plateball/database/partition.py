@@ -0,0 +1,136 @@
+#! /usr/bin/env python3.5
+# Copyright 2017 Gavin Hurlbut
+# vim:ts=4:sw=4:ai:et:si:sts=4
+
+"""Per-season database files.
+
+A partitioned database keeps the small tables (leagues, teams, standings)
+in the main file and each season's games and innings in a file of its own
+next to it.  Every pooled connection ATTACHes the active season's file as
+"season"; the main file has no game or inning tables, so SQLite resolves
+those names in the attached file and the models work unchanged.  Cross
+season reports read each season's file in turn, since SQLite only
+attaches a handful of files (10 by default) at once.
+
+SQLite commits a transaction across attached files atomically only outside
+WAL mode; under WAL each file commits on its own, so a crash can leave a
+season's games recorded without the team records that go with them.  A
+season's teams are checked against its games before it is next written to
+and rescored if they disagree."""
+
+import logging
+import os
+import sqlite3
+from urllib.request import pathname2url
+
+from playhouse.pool import PooledSqliteDatabase
+
+logger = logging.getLogger(__name__)
+
+ACTIVE = "season"
+
+
+def storageLayout(filename):
+    """"partitioned" or "single" for an existing database, else None"""
+    if not os.path.exists(filename):
+        return None
+
+    conn = sqlite3.connect(filename)
+    try:
+        tables = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'")]
+    finally:
+        conn.close()
+
+    if "partition" in tables:
+        return "partitioned"
+    if "game" in tables:
+        return "single"
+    return None
+
+
+def partitionFilename(filename, season):
+    (base, ext) = os.path.splitext(filename)
+    return "%s-season%s%s" % (base, season, ext or ".db")
+
+
+def partitionURI(filename, readonly=False):
+    if not readonly:
+        return filename
+    return "file:%s?mode=ro" % pathname2url(os.path.abspath(filename))
+
+
+def createPartition(filename, models, journalMode=None):
+    """Create the tables and indexes for models in a season file"""
+    conn = sqlite3.connect(filename)
+    try:
+        if journalMode:
+            conn.execute("PRAGMA journal_mode = %s" % journalMode)
+        tables = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'")]
+        for model in models:
+            if model._meta.db_table in tables:
+                continue
+            for sql in model.sqlall():
+                conn.execute(sql)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def freezePartition(filename):
+    """Make a season file read-only.
+
+    Readers can't open a WAL database without write access to its -shm
+    file, so the file goes back to a rollback journal first."""
+    conn = sqlite3.connect(filename)
+    try:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.execute("PRAGMA journal_mode = DELETE")
+    finally:
+        conn.close()
+    os.chmod(filename, 0o444)
+
+
+def removePartition(filename):
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        if os.path.exists(filename + suffix):
+            os.remove(filename + suffix)
+
+
+class PartitionedSqliteDatabase(PooledSqliteDatabase):
+    """Pooled SQLite whose connections attach the active season's file.
+
+    Switching seasons closes the idle connections; ones in use are dropped
+    when they next come out of the pool."""
+    def __init__(self, database, **kwargs):
+        self.partition = None
+        self.generation = 0
+        self.generations = {}
+        # URI filenames, so read-only seasons attach with mode=ro
+        kwargs.setdefault("uri", True)
+        PooledSqliteDatabase.__init__(self, database, **kwargs)
+
+    def attach(self, filename, readonly=False):
+        """Attach filename (None for nothing) to connections from now on"""
+        if filename is None:
+            self.partition = None
+        else:
+            self.partition = (filename, readonly)
+        self.generation += 1
+        if not self.is_closed():
+            self.close()
+        self.close_all()
+
+    def _add_conn_hooks(self, conn):
+        PooledSqliteDatabase._add_conn_hooks(self, conn)
+        if self.partition:
+            conn.execute("ATTACH DATABASE ? AS %s" % ACTIVE,
+                         (partitionURI(*self.partition),))
+        self.generations[self.conn_key(conn)] = self.generation
+
+    def _is_closed(self, key, conn):
+        if self.generations.get(key) != self.generation:
+            self.generations.pop(key, None)
+            return True
+        return PooledSqliteDatabase._is_closed(self, key, conn)
@@ -17,6 +17,7 @@ class League(BaseModel):
     class Meta:
         indexes = (
             (('name', 'season'), True),
+            (('season',), False),
         )
 
 
@@ -44,10 +45,14 @@ class Game(BaseModel):
     runs_home = IntegerField()
     runs_away = IntegerField()
     complete = BooleanField()
+    round = IntegerField(null=True)
 
     class Meta:
         indexes = (
             (("complete",), False),
+            (("complete", "home_team"), False),
+            (("complete", "away_team"), False),
+            (("round",), False),
         )
 
 
@@ -59,6 +64,33 @@ class Inning(BaseModel):
     runs_away = IntegerField()
     class Meta:
         indexes = (
+            (('game', 'inning'), True),
             (('inning',), False),
         )
 
+
+class Standing(BaseModel):
+    id = IntegerField(primary_key=True)
+    team = ForeignKeyField(Team, related_name='standing', unique=True)
+    league = ForeignKeyField(League, related_name='standings')
+    wins = IntegerField()
+    losses = IntegerField()
+    plusminus = IntegerField()
+    runs_for = IntegerField()
+    runs_against = IntegerField()
+    games_behind = FloatField()
+
+    class Meta:
+        indexes = (
+            (('league', 'plusminus'), False),
+            (('league', 'games_behind'), False),
+        )
+
+
+# Seasons whose games and innings live in a file of their own
+class Partition(BaseModel):
+    season = IntegerField(primary_key=True)
+    filename = CharField()
+    readonly = BooleanField()
+    first_game = IntegerField(null=True)
+    last_game = IntegerField(null=True)
@@ -0,0 +1,83 @@
+#! /usr/bin/env python3.5
+# Copyright 2017 Gavin Hurlbut
+# vim:ts=4:sw=4:ai:et:si:sts=4
+
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# SQLite allows a single writer at a time, so a handful of pooled
+# connections covers one writer plus concurrent readers; more only queue
+# up on the file lock.  WAL lets those readers run alongside the writer.
+DEFAULT_PROFILE = {
+    "journal_mode": "wal",
+    "synchronous": "normal",
+    "cache_size": -65536,           # negative is KiB, so 64MB
+    "mmap_size": 268435456,
+    "temp_store": "memory",
+    "busy_timeout": 5000,           # milliseconds
+    "max_connections": 4,
+    "stale_timeout": 600,
+    "partitioned": False,           # new databases: one file per season
+    "row_cache_size": 1024,         # league rows kept in memory
+}
+
+PRAGMAS = ["journal_mode", "synchronous", "cache_size", "mmap_size",
+           "temp_store"]
+INTEGER_SETTINGS = ["cache_size", "mmap_size", "busy_timeout",
+                    "max_connections", "stale_timeout", "row_cache_size"]
+BOOLEAN_SETTINGS = ["partitioned"]
+
+
+def loadStorageProfile(filename=None, overrides=None):
+    """Merge the defaults, an optional JSON config file and overrides.
+
+    The config file holds a single JSON object using the DEFAULT_PROFILE
+    keys.  Values of None in overrides are ignored."""
+    profile = dict(DEFAULT_PROFILE)
+    if filename:
+        with open(filename, "r") as f:
+            profile.update(json.load(f))
+
+    if overrides:
+        profile.update({key: value for (key, value) in overrides.items()
+                        if value is not None})
+
+    unknown = set(profile.keys()) - set(DEFAULT_PROFILE.keys())
+    if unknown:
+        raise ValueError("Unknown storage settings: %s" %
+                         ", ".join(sorted(unknown)))
+
+    for key in INTEGER_SETTINGS:
+        profile[key] = int(profile[key])
+    for key in BOOLEAN_SETTINGS:
+        value = profile[key]
+        if isinstance(value, str):
+            value = value.lower() in ("1", "true", "yes", "on")
+        profile[key] = bool(value)
+
+    return profile
+
+
+def parseSettings(items):
+    """Turn ["key=value", ...] from the command line into a dict"""
+    settings = {}
+    for item in items or []:
+        (key, sep, value) = item.partition("=")
+        if not sep:
+            raise ValueError("Storage setting %s needs key=value" % item)
+        settings[key.strip()] = value.strip()
+    return settings
+
+
+def databaseOptions(profile):
+    """Keyword arguments for PooledSqliteDatabase from a storage profile"""
+    # Pooled connections are handed to whichever thread asks next
+    return {
+        "check_same_thread": False,
+        "max_connections": profile["max_connections"],
+        "stale_timeout": profile["stale_timeout"],
+        "timeout": profile["busy_timeout"] / 1000.0,
+        "pragmas": [(key, profile[key]) for key in PRAGMAS],
+    }
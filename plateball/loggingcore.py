@@ -2,18 +2,101 @@
 # Copyright 2017 Gavin Hurlbut
 # vim:ts=4:sw=4:ai:et:si:sts=4
 
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
+import queue
 
 logger = logging.getLogger(__name__)
 
+FORMAT = "%(asctime)s: %(name)s:%(lineno)d (%(threadName)s) - %(levelname)s - %(message)s"
 
-def setupLogging(level):
-    FORMAT = "%(asctime)s: %(name)s:%(lineno)d (%(threadName)s) - %(levelname)s - %(message)s"
-    logging.basicConfig(format=FORMAT)
-    logging.getLogger(None).setLevel(level)
+# Attributes every LogRecord has; anything else came in through extra=
+RECORD_ATTRS = set(logging.LogRecord("", 0, "", 0, "", None, None)
+                   .__dict__.keys()) | {"message", "asctime"}
+
+_listener = None
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line, with any extra= fields as keys"""
+    def format(self, record):
+        item = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "line": record.lineno,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            item["exception"] = self.formatException(record.exc_info)
+        for (key, value) in record.__dict__.items():
+            if key not in RECORD_ATTRS:
+                item[key] = value
+        return json.dumps(item, default=str)
+
+
+class LocalQueueHandler(logging.handlers.QueueHandler):
+    """Queues records with their exception info still attached.
+
+    The stock prepare() formats each record into its message and drops
+    exc_info, so the record can be pickled to another process.  The
+    listener here is a thread in this process, so it gets the record as
+    logged and JSONFormatter can report the exception on its own."""
+    def prepare(self, record):
+        record = copy.copy(record)
+        # Fix the message now, in case the arguments change after queueing
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def setupLogging(level, jsonFormat=False, queued=True):
+    """Log to stderr, as text or JSON lines.
+
+    With queued set, callers only put records on a queue and a listener
+    thread does the formatting and writing, so slow terminals or log
+    files don't hold up the work being logged.  Calling it again replaces
+    the previous setup."""
+    global _listener
+    stopLogging()
+
+    root = logging.getLogger(None)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+
+    handler = logging.StreamHandler()
+    if jsonFormat:
+        handler.setFormatter(JSONFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(FORMAT))
+
+    if queued:
+        records = queue.Queue(-1)
+        _listener = logging.handlers.QueueListener(
+            records, handler, respect_handler_level=True)
+        _listener.start()
+        handler = LocalQueueHandler(records)
+
+    root.addHandler(handler)
+    root.setLevel(level)
     logging.captureWarnings(True)
 
 
+def stopLogging():
+    """Write out anything still queued"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stopLogging)
+
+
 def debugLogging(debug):
     if debug:
         logging.getLogger(None).setLevel(logging.DEBUG)
@@ -23,4 +106,3 @@ def debugLogging(debug):
         logging.getLogger("AWSFirmwarePythonUtils.odin").setLevel(logging.ERROR)
         logging.getLogger("AWSFirmwarePythonUtils.dynamodbclient").setLevel(logging.ERROR)
         logging.getLogger("requests").setLevel(logging.CRITICAL)
-
@@ -0,0 +1,216 @@
+#! /usr/bin/env python3.5
+# Copyright 2017 Gavin Hurlbut
+# vim:ts=4:sw=4:ai:et:si:sts=4
+
+import logging
+import os
+import shutil
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, groupby, islice
+from string import Formatter
+
+from reportlab.pdfgen.canvas import Canvas
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.units import inch
+
+from plateball.profiling import phase
+from plateball.qrcache import QRCodeCache, gameQRData
+from plateball.scorecard import ScorecardTemplate, drawScorecard, \
+    CARD_WIDTH, CARD_HEIGHT
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = letter
+MARGIN = 1*inch
+# SimpleDocTemplate's frame padding, kept so card positions don't change
+PADDING = 6
+CARD_SPACING = 0.1*inch
+CARDS_PER_PAGE = int((PAGE_SIZE[1] - 2 * (MARGIN + PADDING)) //
+                     (CARD_HEIGHT + CARD_SPACING))
+PAGES_PER_BATCH = 4
+
+# The --output field each kind of split fills in, and the option making it
+SPLIT_FIELDS = {"league": "--split_league", "part": "--cards_per_file"}
+
+
+def outputFilename(output, part=None, league=None):
+    """Build a split output name from a pattern like "cards-{league}.pdf".
+
+    A split the pattern has no field for gets "-L<league>" or "-<part>"
+    inserted before the extension.  Raises ValueError for a field whose
+    split isn't being made."""
+    values = {"part": part, "league": league}
+    fields = set(field for (text, field, spec, conversion)
+                 in Formatter().parse(output) if field is not None)
+    for field in fields:
+        if field not in SPLIT_FIELDS:
+            raise ValueError("Unknown field {%s} in %s" % (field, output))
+        if values[field] is None:
+            raise ValueError("Field {%s} in %s needs %s" %
+                             (field, output, SPLIT_FIELDS[field]))
+
+    if fields:
+        output = output.format(**values)
+    (base, ext) = os.path.splitext(output)
+    if league is not None and "league" not in fields:
+        base += "-L%s" % league
+    if part is not None and "part" not in fields:
+        base += "-%03d" % part
+    return base + ext
+
+
+def checkOutput(output, cardsPerFile=None, byLeague=False):
+    """Raise ValueError if output has a field for a split not being made"""
+    outputFilename(output, 1 if cardsPerFile else None,
+                   0 if byLeague else None)
+
+
+def renderScorecards(games, filename, qrCache=None):
+    """Lay cards out directly on a canvas, showing each page once full.
+
+    Returns the filename, or None (writing nothing) if there were no
+    games."""
+    if qrCache is None:
+        qrCache = QRCodeCache()
+
+    canvas = Canvas(filename, pagesize=PAGE_SIZE)
+    template = ScorecardTemplate()
+    x = (PAGE_SIZE[0] - CARD_WIDTH) / 2.0
+    top = PAGE_SIZE[1] - MARGIN - PADDING
+    onPage = 0
+    drawn = 0
+    for game in games:
+        if onPage == CARDS_PER_PAGE:
+            canvas.showPage()
+            onPage = 0
+        y = top - (onPage + 1) * (CARD_SPACING + CARD_HEIGHT)
+        with phase("qr"):
+            matrix = qrCache.getMatrix(gameQRData(game.id))
+        with phase("layout"):
+            canvas.saveState()
+            canvas.translate(x, y)
+            drawScorecard(canvas, game, matrix, template)
+            canvas.restoreState()
+        onPage += 1
+        drawn += 1
+
+    if not drawn:
+        return None
+    with phase("pdf_write"):
+        canvas.showPage()
+        canvas.save()
+    return filename
+
+
+def _renderBatch(batch):
+    (games, filename, qrCache) = batch
+    return renderScorecards(games, filename, qrCache)
+
+
+def _pdfMerger():
+    try:
+        from pypdf import PdfWriter
+        return PdfWriter
+    except ImportError:
+        pass
+
+    try:
+        from PyPDF2 import PdfFileMerger
+        return PdfFileMerger
+    except ImportError:
+        return None
+
+
+def renderScorecardsParallel(games, filename, jobs, qrCache=None,
+                             batchSize=CARDS_PER_PAGE * PAGES_PER_BATCH):
+    """Render page-aligned batches in a process pool, then merge in order.
+
+    Falls back to a single process render if neither pypdf nor PyPDF2 is
+    installed to do the merge.  Games are read a batch at a time, with at
+    most two batches per worker in flight, so memory stays bounded however
+    many cards are printed."""
+    merger = _pdfMerger()
+    if merger is None:
+        logger.warning("pypdf not available, rendering in one process")
+        return renderScorecards(games, filename, qrCache)
+
+    # Keep batches whole pages so no card moves when the parts are joined
+    batchSize = max(batchSize // CARDS_PER_PAGE, 1) * CARDS_PER_PAGE
+    games = iter(games)
+    first = list(islice(games, batchSize))
+    second = list(islice(games, batchSize)) if jobs >= 2 else []
+    if not second:
+        return renderScorecards(chain(first, games), filename, qrCache)
+
+    tmpdir = tempfile.mkdtemp(prefix="plateball-")
+    try:
+        rest = iter(lambda: list(islice(games, batchSize)), [])
+        batches = ((batch, os.path.join(tmpdir, "part%06d.pdf" % index),
+                    qrCache)
+                   for (index, batch) in
+                   enumerate(chain([first, second], rest)))
+        parts = []
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            for batch in batches:
+                pending.append(executor.submit(_renderBatch, batch))
+                if len(pending) >= 2 * jobs:
+                    parts.append(pending.popleft().result())
+            parts.extend(future.result() for future in pending)
+
+        output = merger()
+        for part in parts:
+            output.append(part)
+        with open(filename, "wb") as f:
+            output.write(f)
+        output.close()
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    return filename
+
+
+def _splitGames(games, cardsPerFile=None, byLeague=False):
+    """Yield (part, league, games) file groups without materializing them"""
+    if byLeague:
+        leagueGroups = groupby(games, key=lambda game: game.league)
+    else:
+        leagueGroups = [(None, iter(games))]
+
+    for (league, leagueGames) in leagueGroups:
+        if not cardsPerFile:
+            yield (None, league, leagueGames)
+            continue
+
+        part = 0
+        while True:
+            chunk = list(islice(leagueGames, cardsPerFile))
+            if not chunk:
+                break
+            part += 1
+            yield (part, league, chunk)
+
+
+def printScorecards(games, output, jobs=1, qrCache=None, cardsPerFile=None,
+                    byLeague=False):
+    """Render a stream of games, optionally split by league or card count.
+
+    Returns the list of files written.  Split files are named using
+    outputFilename(), which is checked against the splits before anything
+    is written."""
+    checkOutput(output, cardsPerFile, byLeague)
+    files = []
+    for (part, league, group) in _splitGames(games, cardsPerFile, byLeague):
+        filename = outputFilename(output, part, league)
+        if jobs and jobs > 1:
+            written = renderScorecardsParallel(group, filename, jobs, qrCache)
+        else:
+            written = renderScorecards(group, filename, qrCache)
+        if written is None:
+            logger.info("No games to print for %s" % filename)
+            continue
+        logger.info("Wrote %s" % filename)
+        files.append(filename)
+    return files
@@ -0,0 +1,134 @@
+#! /usr/bin/env python3.5
+# Copyright 2017 Gavin Hurlbut
+# vim:ts=4:sw=4:ai:et:si:sts=4
+
+import json
+import logging
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+_active = None
+
+
+@contextmanager
+def phase(name):
+    """Attribute the enclosed work to a named phase of the active profiler.
+
+    Does nothing unless a Profiler is running, so it is cheap enough to
+    leave in hot paths."""
+    if _active is None:
+        yield
+        return
+
+    with _active.phase(name):
+        yield
+
+
+class Profiler(object):
+    """Per-phase wall time, SQL query count/time and peak memory.
+
+    Phases nest; SQL run inside a nested phase counts towards every phase
+    on the stack, and repeated phases of the same name are totalled."""
+    def __init__(self, cprofile=False):
+        self.phases = {}
+        self.order = []
+        self.stack = []
+        # Peak memory so far in each phase on the stack
+        self.peaks = []
+        self.cprofile = None
+        if cprofile:
+            import cProfile
+            self.cprofile = cProfile.Profile()
+
+    def install(self, database):
+        """Hook a peewee database's execute_sql to time every query"""
+        execute_sql = database.execute_sql
+
+        def timed_execute_sql(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return execute_sql(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                for name in set(self.stack):
+                    stats = self.phases[name]
+                    stats["sql_queries"] += 1
+                    stats["sql_seconds"] += elapsed
+
+        database.execute_sql = timed_execute_sql
+
+    def start(self):
+        global _active
+        _active = self
+        tracemalloc.start()
+        if self.cprofile:
+            self.cprofile.enable()
+
+    def stop(self):
+        global _active
+        if self.cprofile:
+            self.cprofile.disable()
+        tracemalloc.stop()
+        _active = None
+
+    @contextmanager
+    def phase(self, name):
+        if name not in self.phases:
+            self.order.append(name)
+            self.phases[name] = {
+                "calls": 0,
+                "seconds": 0.0,
+                "sql_queries": 0,
+                "sql_seconds": 0.0,
+                "peak_memory": 0,
+            }
+        stats = self.phases[name]
+        stats["calls"] += 1
+        current = self.foldPeak()
+        self.stack.append(name)
+        self.peaks.append(current)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stats["seconds"] += time.perf_counter() - start
+            self.foldPeak()
+            self.stack.pop()
+            stats["peak_memory"] = max(stats["peak_memory"],
+                                       self.peaks.pop())
+
+    def foldPeak(self):
+        """Credit the peak since the last reset to every open phase and
+        start a new window, returning the memory in use.  Python before
+        3.9 can't reset the peak, so there it is process wide."""
+        (current, peak) = tracemalloc.get_traced_memory()
+        self.peaks = [max(item, peak) for item in self.peaks]
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        return current
+
+    def report(self):
+        return [dict(phase=name, **self.phases[name]) for name in self.order]
+
+    def summary(self):
+        lines = ["%-20s %7s %10s %8s %10s %10s" %
+                 ("Phase", "Calls", "Wall (s)", "Queries", "SQL (s)",
+                  "Peak (KB)")]
+        lines.append("-" * len(lines[0]))
+        for item in self.report():
+            lines.append("%-20s %7d %10.3f %8d %10.3f %10d" %
+                         (item["phase"], item["calls"], item["seconds"],
+                          item["sql_queries"], item["sql_seconds"],
+                          item["peak_memory"] // 1024))
+        return "\n".join(lines)
+
+    def writeJSON(self, filename):
+        with open(filename, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+    def writeStats(self, filename):
+        if self.cprofile:
+            self.cprofile.dump_stats(filename)
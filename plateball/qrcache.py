@@ -0,0 +1,68 @@
+#! /usr/bin/env python3.5
+# Copyright 2017 Gavin Hurlbut
+# vim:ts=4:sw=4:ai:et:si:sts=4
+
+import hashlib
+import logging
+import os
+import tempfile
+
+import qrcode
+
+logger = logging.getLogger(__name__)
+
+
+def gameQRData(gameid):
+    return "Game ID: %s" % gameid
+
+
+class QRCodeCache(object):
+    """Content-addressed on-disk cache of QR code module matrices.
+
+    Entries are stored as rows of 0/1 characters under a name derived from
+    the SHA-1 of the encoded text, so the same game always maps to the same
+    file.  With no directory, every lookup just encodes the data."""
+    def __init__(self, directory=None):
+        self.directory = directory
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def path(self, data):
+        digest = hashlib.sha1(data.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest + ".qr")
+
+    def getMatrix(self, data):
+        """Return the QR code for data as a list of rows of booleans"""
+        if not self.directory:
+            return self.encode(data)
+
+        path = self.path(data)
+        try:
+            with open(path, "r") as f:
+                return [[char == "1" for char in line.strip()]
+                        for line in f if line.strip()]
+        except (IOError, OSError):
+            pass
+
+        matrix = self.encode(data)
+        self.store(path, matrix)
+        return matrix
+
+    def store(self, path, matrix):
+        dirname = os.path.dirname(path)
+        os.makedirs(dirname, exist_ok=True)
+        # Write then rename so parallel renderers never see partial entries
+        (fd, tmpname) = tempfile.mkstemp(dir=dirname, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            for row in matrix:
+                f.write("".join("1" if cell else "0" for cell in row))
+                f.write("\n")
+        os.replace(tmpname, path)
+
+    def encode(self, data):
+        qr = qrcode.QRCode(version=1,
+                error_correction=qrcode.constants.ERROR_CORRECT_H,
+                border=4)
+        qr.add_data(data)
+        qr.make(fit=True)
+        return qr.get_matrix()
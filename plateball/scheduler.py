@@ -0,0 +1,86 @@
+#! /usr/bin/env python3.5
+# Copyright 2017 Gavin Hurlbut
+# vim:ts=4:sw=4:ai:et:si:sts=4
+
+import logging
+from itertools import zip_longest
+from random import Random
+
+logger = logging.getLogger(__name__)
+
+# Each leg is one single round robin: (season wide?, home/away mirrored?).
+# Every in-league pair meets 8 times (4 home each way) and every interleague
+# pair twice (once each way), with the two season wide legs spreading the
+# interleague games through the schedule.
+LEGS = (
+    (True, False),
+    (False, False),
+    (False, True),
+    (False, False),
+    (True, True),
+    (False, True),
+    (False, False),
+    (False, True),
+)
+
+
+def roundRobin(teams, mirror=False):
+    """Yield the rounds of a single round robin using the circle method.
+
+    Each round is a list of (home, away) pairs in which every team appears
+    at most once.  With an odd number of teams one team sits out each
+    round.  mirror swaps home and away for every game."""
+    teams = list(teams)
+    if len(teams) < 2:
+        return
+    if len(teams) % 2:
+        teams.append(None)
+
+    count = len(teams)
+    for roundNum in range(count - 1):
+        pairs = []
+        for i in range(count // 2):
+            home = teams[i]
+            away = teams[count - 1 - i]
+            if home is None or away is None:
+                continue
+            # The rotating teams change sides as they go round the circle,
+            # the fixed team has to alternate explicitly
+            if i == 0 and roundNum % 2:
+                (home, away) = (away, home)
+            if mirror:
+                (home, away) = (away, home)
+            pairs.append((home, away))
+        yield pairs
+
+        # Hold the first team, rotate the rest one place clockwise
+        teams = [teams[0], teams[-1]] + teams[1:-1]
+
+
+def scheduleSeason(leagueTeams, seed=None, legs=LEGS):
+    """Stream a season schedule as (roundNum, [(home, away), ...]) tuples.
+
+    leagueTeams is a list with one list of team ids per league.  Rounds are
+    numbered from 1 and no team plays twice in the same round.  In-league
+    legs run every league's round robin side by side; season wide legs pair
+    all teams, so interleague games are mixed in with league games."""
+    rng = Random(seed)
+    leagueTeams = [list(teams) for teams in leagueTeams]
+    for teams in leagueTeams:
+        rng.shuffle(teams)
+    allTeams = [team for teams in leagueTeams for team in teams]
+    rng.shuffle(allTeams)
+
+    roundNum = 0
+    for (seasonWide, mirror) in legs:
+        if seasonWide:
+            rounds = roundRobin(allTeams, mirror)
+        else:
+            leagueRounds = [roundRobin(teams, mirror)
+                            for teams in leagueTeams]
+            rounds = (sum([pairs for pairs in merged if pairs], [])
+                      for merged in zip_longest(*leagueRounds))
+
+        for pairs in rounds:
+            roundNum += 1
+            yield (roundNum, pairs)
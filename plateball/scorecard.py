@@ -0,0 +1,126 @@
+#! /usr/bin/env python3.5
+# Copyright 2017 Gavin Hurlbut
+# vim:ts=4:sw=4:ai:et:si:sts=4
+
+import logging
+
+from reportlab.lib.units import inch, cm
+from reportlab.lib.colors import black, red, blue
+
+logger = logging.getLogger(__name__)
+
+CELL = 1*cm
+INNINGS = 14
+QR_WIDTH = 3*cm
+QR_SIZE = 1*inch
+CARD_WIDTH = QR_WIDTH + (INNINGS + 2) * CELL
+CARD_HEIGHT = 3 * CELL
+FONT = "Helvetica"
+FONT_SIZE = 10
+LABEL_FONT_SIZE = 5
+
+
+def drawCentered(canvas, text, x, y, fontSize):
+    """Draw text centred on (x, y), with y at mid cap height"""
+    canvas.setFont(FONT, fontSize)
+    canvas.drawCentredString(x, y - fontSize * 0.35, text)
+
+
+def drawQRCode(canvas, matrix, x, y, size):
+    """Draw a QR module matrix as filled rectangles, lower left at (x, y)"""
+    module = float(size) / len(matrix)
+    canvas.saveState()
+    canvas.setFillColor(black)
+    for (rowNum, row) in enumerate(matrix):
+        top = y + size - (rowNum + 1) * module
+        start = None
+        # Merge runs of dark modules into single rectangles
+        for (colNum, cell) in enumerate(list(row) + [False]):
+            if cell and start is None:
+                start = colNum
+            elif not cell and start is not None:
+                canvas.rect(x + start * module, top,
+                            (colNum - start) * module, module,
+                            stroke=0, fill=1)
+                start = None
+    canvas.restoreState()
+
+
+class ScorecardTemplate(object):
+    """The static scorecard grid, drawn once per PDF as a Form XObject.
+
+    Every card references the form with doForm(), so drawScorecard() only
+    draws its own league/game label, team letters and QR code on top."""
+    name = "plateballScorecard"
+
+    def use(self, canvas):
+        if not canvas.hasForm(self.name):
+            canvas.beginForm(self.name, 0, 0, CARD_WIDTH, CARD_HEIGHT)
+            self.draw(canvas)
+            canvas.endForm()
+        canvas.doForm(self.name)
+
+    def draw(self, canvas):
+        left = QR_WIDTH
+        right = CARD_WIDTH
+
+        # Score grid
+        canvas.setStrokeColor(black)
+        canvas.setLineWidth(1)
+        for row in range(4):
+            canvas.line(left, row * CELL, right, row * CELL)
+        for col in range(INNINGS + 3):
+            x = left + col * CELL
+            canvas.line(x, 0, x, CARD_HEIGHT)
+
+        # Innings 1-9 and extra innings divider
+        canvas.setLineWidth(2)
+        x = left + 10 * CELL
+        canvas.line(x, 0, x, CARD_HEIGHT)
+
+        # Final score cells
+        canvas.setStrokeColor(blue)
+        x = right - CELL
+        canvas.rect(x, 0, CELL, 2 * CELL, stroke=1, fill=0)
+        canvas.line(x, CELL, right, CELL)
+
+        # Three out boxes across the top of each inning cell
+        canvas.setStrokeColor(red)
+        canvas.setLineWidth(0.5)
+        box = 0.3*cm
+        for top in (2 * CELL, CELL):
+            y = top - 0.05*cm - box
+            for inning in range(1, INNINGS + 1):
+                x = left + inning * CELL + 0.05*cm
+                for out in range(3):
+                    canvas.rect(x + out * box, y, box, box, stroke=1, fill=0)
+
+        # Header row
+        canvas.setFillColor(black)
+        y = 2.5 * CELL
+        for inning in range(1, INNINGS + 1):
+            drawCentered(canvas, str(inning),
+                         left + (inning + 0.5) * CELL, y, FONT_SIZE)
+        drawCentered(canvas, "FIN", right - 0.5 * CELL, y, FONT_SIZE)
+
+        # Outer border
+        canvas.setStrokeColor(black)
+        canvas.setLineWidth(2)
+        canvas.rect(0, 0, CARD_WIDTH, CARD_HEIGHT, stroke=1, fill=0)
+
+
+def drawScorecard(canvas, game, matrix, template):
+    """Draw one card with its lower left corner at the canvas origin"""
+    template.use(canvas)
+
+    x = QR_WIDTH + 0.5 * CELL
+    canvas.setFillColor(black)
+    drawCentered(canvas, "L: %s" % game.league, x, 2.5 * CELL + 3.5,
+                 LABEL_FONT_SIZE)
+    drawCentered(canvas, "G: %s" % game.id, x, 2.5 * CELL - 3.5,
+                 LABEL_FONT_SIZE)
+    drawCentered(canvas, game.away, x, 1.5 * CELL, FONT_SIZE)
+    drawCentered(canvas, game.home, x, 0.5 * CELL, FONT_SIZE)
+
+    offset = (QR_WIDTH - QR_SIZE) / 2.0
+    drawQRCode(canvas, matrix, offset, offset, QR_SIZE)
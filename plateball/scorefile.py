@@ -0,0 +1,106 @@
+#! /usr/bin/env python3.5
+# Copyright 2017 Gavin Hurlbut
+# vim:ts=4:sw=4:ai:et:si:sts=4
+
+import json
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+READ_SIZE = 65536
+MAX_RECORD_SIZE = 16 * 1024 * 1024
+# Whitespace and commas between array elements
+SEPARATORS = re.compile(r"[ \t\n\r,]*")
+
+
+def iterScoreRecords(f, readSize=READ_SIZE):
+    """Incrementally parse a score file, yielding (recordNum, record).
+
+    Accepts either newline-delimited JSON (one game object per line) or the
+    classic single top-level JSON array.  A record that cannot be decoded is
+    yielded as (recordNum, None) so the caller can count it as an error."""
+    first = ""
+    while not first:
+        chunk = f.read(readSize)
+        if not chunk:
+            return
+        first = chunk.lstrip()
+
+    if first.startswith("["):
+        for item in _iterArray(f, first[1:], readSize):
+            yield item
+    else:
+        for item in _iterLines(f, first, readSize):
+            yield item
+
+
+def _iterLines(f, buf, readSize):
+    count = 0
+    pos = 0
+    eof = False
+    while not eof or pos < len(buf):
+        end = buf.find("\n", pos)
+        if end < 0:
+            if not eof:
+                chunk = f.read(readSize)
+                if chunk:
+                    # Consumed lines are dropped only when refilling
+                    buf = buf[pos:] + chunk
+                    pos = 0
+                    continue
+                eof = True
+            end = len(buf)
+
+        line = buf[pos:end].strip()
+        pos = end + 1
+        if not line:
+            continue
+
+        count += 1
+        try:
+            yield (count, json.loads(line))
+        except ValueError as e:
+            logger.warning("Undecodable JSON in record #%s: %s" % (count, e))
+            yield (count, None)
+
+
+def _iterArray(f, buf, readSize):
+    decoder = json.JSONDecoder()
+    count = 0
+    pos = 0
+    eof = False
+    while True:
+        pos = SEPARATORS.match(buf, pos).end()
+        if buf.startswith("]", pos):
+            return
+
+        if pos < len(buf):
+            try:
+                (record, end) = decoder.raw_decode(buf, pos)
+            except ValueError as e:
+                if eof or len(buf) - pos > MAX_RECORD_SIZE:
+                    logger.error("Undecodable JSON after record #%s, "
+                                 "stopping: %s" % (count, e))
+                    yield (count + 1, None)
+                    return
+            else:
+                # A trailing number may continue in the next read
+                if end < len(buf) or eof or isinstance(record, (dict, list)):
+                    count += 1
+                    yield (count, record)
+                    pos = end
+                    continue
+
+        if eof:
+            if pos < len(buf):
+                logger.error("Truncated JSON array after record #%s" % count)
+            return
+
+        chunk = f.read(readSize)
+        if chunk:
+            # Consumed records are dropped only when refilling
+            buf = buf[pos:] + chunk
+            pos = 0
+        else:
+            eof = True
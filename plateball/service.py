@@ -0,0 +1,373 @@
+#! /usr/bin/env python3.5
+# Copyright 2017 Gavin Hurlbut
+# vim:ts=4:sw=4:ai:et:si:sts=4
+
+import asyncio
+import json
+import logging
+import os
+import re
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from http import HTTPStatus
+from urllib.parse import urlsplit, parse_qs
+
+from peewee import DatabaseError
+from playhouse.pool import MaxConnectionsExceeded
+from plateball.database.access import tallyInnings
+from plateball.database.schema import League
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 0.05           # seconds to wait for a batch to fill
+QUEUE_SIZE = 10000
+# Writer threads shared by the tenants; each tenant has one write at a time
+WRITE_THREADS = 4
+MAX_BODY = 1024 * 1024
+MAX_HEADERS = 100
+REQUEST_TIMEOUT = 30
+TENANT_NAME = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+class RequestError(Exception):
+    def __init__(self, status, message):
+        Exception.__init__(self, message)
+        self.status = status
+
+
+def validateRecord(record):
+    """Check a {"id", "scores"} submission before it is queued.
+
+    Returns (gameid, scores) or raises ValueError.  Completion uses the same
+    inning and walk-off rules recordScores applies.  A game id given as a
+    string of digits is taken as that number."""
+    if not isinstance(record, dict):
+        raise ValueError("Record is not an object")
+
+    gameid = record.get("id", None)
+    if isinstance(gameid, str) and gameid.strip().isdecimal():
+        gameid = int(gameid)
+    if not isinstance(gameid, int) or isinstance(gameid, bool) or \
+            gameid <= 0:
+        raise ValueError("No Game ID")
+
+    scores = record.get("scores", None)
+    if not isinstance(scores, list):
+        raise ValueError("Invalid scores info")
+    for score in scores:
+        if not isinstance(score, list) or len(score) != 2 or \
+                not all(isinstance(runs, int) and not isinstance(runs, bool)
+                        and runs >= 0 for runs in score):
+            raise ValueError("Innings must be [away, home] run counts")
+
+    (innings, runs_home, runs_away, complete) = tallyInnings(scores)
+    if not complete:
+        raise ValueError("Game incomplete")
+
+    return (gameid, scores)
+
+
+class ScoreService(object):
+    """HTTP service taking score submissions and standings queries.
+
+    Submissions are validated on arrival and queued; a single writer task
+    drains the queue into recordScores batches so concurrent submitters
+    share one transaction instead of contending for the SQLite lock.  Each
+    submitter still waits for its batch to commit before getting a reply.
+
+    Given a HandleManager and a directory instead of a database, the
+    service hosts every "<tenant>.db" in the directory under /<tenant>/,
+    with a queue and writer task per tenant."""
+    def __init__(self, db, batchSize=BATCH_SIZE, flushInterval=FLUSH_INTERVAL,
+                 queueSize=QUEUE_SIZE, replace=False, handles=None,
+                 tenantDir=None):
+        self.db = db
+        self.handles = handles
+        self.tenantDir = tenantDir
+        self.replace = replace
+        self.batchSize = batchSize
+        self.flushInterval = flushInterval
+        self.queueSize = queueSize
+        self.writers = {}
+        self.server = None
+        # One thread per database would do; tenants share a few
+        self.writeExecutor = ThreadPoolExecutor(
+            max_workers=WRITE_THREADS if handles else 1)
+        # Each reader thread holds a pooled connection while it queries;
+        # one connection per database is left for its writer
+        readers = max(db.profile["max_connections"] - 1, 1)
+        self.readExecutor = ThreadPoolExecutor(max_workers=readers)
+
+    async def start(self, host, port):
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+        # Queued submissions are written before shutting down
+        for (queue, task) in self.writers.values():
+            await queue.put(None)
+        for (queue, task) in self.writers.values():
+            await task
+        self.writeExecutor.shutdown()
+        self.readExecutor.shutdown()
+
+    def tenantFile(self, tenant):
+        return os.path.join(self.tenantDir, "%s.db" % tenant)
+
+    @contextmanager
+    def database(self, tenant):
+        """The database for a tenant (None without tenants), bound to the
+        calling thread"""
+        if tenant is None:
+            with self.db.bind():
+                yield self.db
+            return
+        with self.handles.using(self.tenantFile(tenant)) as db:
+            yield db
+
+    def queueFor(self, tenant):
+        if tenant not in self.writers:
+            queue = asyncio.Queue(self.queueSize)
+            task = asyncio.ensure_future(self.writer(tenant, queue))
+            self.writers[tenant] = (queue, task)
+        return self.writers[tenant][0]
+
+    async def writer(self, tenant, queue):
+        loop = asyncio.get_event_loop()
+        stopping = False
+        while not stopping:
+            item = await queue.get()
+            if item is None:
+                break
+
+            batch = [item]
+            deadline = loop.time() + self.flushInterval
+            while len(batch) < self.batchSize:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            records = [(gameid, scores) for (gameid, scores, future) in batch]
+            try:
+                results = await loop.run_in_executor(
+                    self.writeExecutor, self.record, tenant, records)
+            except Exception:
+                logger.exception("Writing %s scores failed" % len(batch))
+                results = [False] * len(batch)
+
+            for ((gameid, scores, future), result) in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def record(self, tenant, records):
+        with self.database(tenant) as db:
+            return self.recordBatch(db, records)
+
+    def recordBatch(self, db, records):
+        try:
+            return db.recordScores(records, self.replace)
+        except DatabaseError:
+            # One bad record rolls back the whole batch, retry one by one so
+            # the rest still get recorded
+            logger.exception("Batch of %s scores failed, retrying singly" %
+                             len(records))
+
+        results = []
+        for record in records:
+            try:
+                results.extend(db.recordScores([record], self.replace))
+            except DatabaseError:
+                logger.exception("Recording game %s failed" % record[0])
+                results.append(False)
+        return results
+
+    async def submit(self, tenant, record):
+        try:
+            (gameid, scores) = validateRecord(record)
+        except ValueError as e:
+            return (HTTPStatus.UNPROCESSABLE_ENTITY, {"error": str(e)})
+
+        future = asyncio.get_event_loop().create_future()
+        try:
+            self.queueFor(tenant).put_nowait((gameid, scores, future))
+        except asyncio.QueueFull:
+            return (HTTPStatus.SERVICE_UNAVAILABLE,
+                    {"id": gameid, "error": "Too many pending scores"})
+
+        recorded = await future
+        if not recorded:
+            return (HTTPStatus.CONFLICT,
+                    {"id": gameid, "error": "Score rejected"})
+        return (HTTPStatus.OK, {"id": gameid, "recorded": True})
+
+    async def postScores(self, tenant, body):
+        try:
+            data = json.loads(body.decode("utf-8"))
+        except ValueError:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "Invalid JSON")
+
+        if not isinstance(data, list):
+            result = await self.submit(tenant, data)
+            return result
+
+        results = await asyncio.gather(*[self.submit(tenant, record)
+                                         for record in data])
+        statuses = set(status for (status, result) in results)
+        statuses.discard(HTTPStatus.OK)
+        status = max(statuses) if statuses else HTTPStatus.OK
+        return (status, [result for (status, result) in results])
+
+    async def getStandings(self, tenant, query):
+        try:
+            leagueid = int(query["league"][0])
+        except (KeyError, ValueError):
+            raise RequestError(HTTPStatus.BAD_REQUEST, "Needs ?league=ID")
+
+        def standings():
+            # Runs in an executor thread, returning its connection after
+            with self.database(tenant) as db, db.execution_context():
+                try:
+                    league = db.getLeagueById(leagueid)
+                except League.DoesNotExist:
+                    return None
+                return db.getStandingsData(league)
+
+        loop = asyncio.get_event_loop()
+        scores = await loop.run_in_executor(self.readExecutor, standings)
+        if scores is None:
+            raise RequestError(HTTPStatus.NOT_FOUND, "No such league")
+        return (HTTPStatus.OK, {"league": leagueid, "standings": scores})
+
+    async def dispatch(self, reader):
+        line = await reader.readline()
+        try:
+            (method, target, version) = line.decode("latin-1").split()
+        except ValueError:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "Bad request line")
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            if len(headers) >= MAX_HEADERS:
+                raise RequestError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE,
+                                   "Too many headers")
+            (name, sep, value) = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "Bad Content-Length")
+        if length > MAX_BODY:
+            raise RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                               "Body too large")
+        body = await reader.readexactly(length)
+
+        url = urlsplit(target)
+        (tenant, resource) = self.route(url.path)
+        if resource == "scores":
+            if method != "POST":
+                raise RequestError(HTTPStatus.METHOD_NOT_ALLOWED, "Use POST")
+            result = await self.postScores(tenant, body)
+            return result
+
+        if resource == "standings":
+            if method != "GET":
+                raise RequestError(HTTPStatus.METHOD_NOT_ALLOWED, "Use GET")
+            result = await self.getStandings(tenant, parse_qs(url.query))
+            return result
+
+        raise RequestError(HTTPStatus.NOT_FOUND, "No such resource")
+
+    def route(self, path):
+        """Split a request path into (tenant, resource)"""
+        parts = path.strip("/").split("/")
+        if self.handles is None:
+            if len(parts) != 1:
+                raise RequestError(HTTPStatus.NOT_FOUND, "No such resource")
+            return (None, parts[0])
+
+        if len(parts) != 2:
+            raise RequestError(HTTPStatus.NOT_FOUND, "No such resource")
+        if not TENANT_NAME.match(parts[0]) or \
+                not os.path.exists(self.tenantFile(parts[0])):
+            raise RequestError(HTTPStatus.NOT_FOUND, "No such tenant")
+        return (parts[0], parts[1])
+
+    async def handle(self, reader, writer):
+        try:
+            (status, result) = await asyncio.wait_for(
+                self.dispatch(reader), REQUEST_TIMEOUT)
+        except RequestError as e:
+            (status, result) = (e.status, {"error": str(e)})
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+            writer.close()
+            return
+        except MaxConnectionsExceeded:
+            logger.warning("Database connections exhausted")
+            (status, result) = (HTTPStatus.SERVICE_UNAVAILABLE,
+                                {"error": "Database busy, try again"})
+        except Exception:
+            logger.exception("Request failed")
+            (status, result) = (HTTPStatus.INTERNAL_SERVER_ERROR,
+                                {"error": "Internal error"})
+
+        payload = json.dumps(result).encode("utf-8")
+        header = "HTTP/1.1 %d %s\r\n" \
+                 "Content-Type: application/json\r\n" \
+                 "Content-Length: %d\r\n" \
+                 "Connection: close\r\n\r\n" % \
+                 (status, status.phrase, len(payload))
+        writer.write(header.encode("latin-1") + payload)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+
+def runService(db, host, port, batchSize=BATCH_SIZE,
+               flushInterval=FLUSH_INTERVAL, replace=False, handles=None,
+               tenantDir=None):
+    loop = asyncio.get_event_loop()
+    service = ScoreService(db, batchSize, flushInterval, replace=replace,
+                           handles=handles, tenantDir=tenantDir)
+    loop.run_until_complete(service.start(host, port))
+    if tenantDir:
+        logger.info("Accepting scores on http://%s:%s/<tenant>/ for %s" %
+                    (host, port, tenantDir))
+    else:
+        logger.info("Accepting scores on http://%s:%s/" % (host, port))
+
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, loop.stop)
+        except NotImplementedError:
+            pass
+
+    try:
+        loop.run_forever()
+    finally:
+        logger.info("Shutting down, writing queued scores")
+        loop.run_until_complete(service.stop())
+        loop.close()
+        if handles:
+            logger.info("Databases: %(open)s open, %(opened)s opened, "
+                        "%(hits)s reused, %(evictions)s closed" %
+                        handles.stats())
+            handles.closeAll()
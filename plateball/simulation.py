@@ -0,0 +1,143 @@
+#! /usr/bin/env python3.5
+# Copyright 2017 Gavin Hurlbut
+# vim:ts=4:sw=4:ai:et:si:sts=4
+
+import logging
+import random
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ITERATIONS = 20000
+# Iterations per chunk; each chunk has its own seed so results for a given
+# seed don't depend on how many workers share the chunks
+CHUNK = 2000
+# Games of league average play blended into every team's scoring rates,
+# keeping early season rates from swinging on a handful of games
+PRIOR_GAMES = 5
+# Runs per game assumed for each side before anything has been played
+DEFAULT_RUNS = 4.0
+
+Season = namedtuple("Season", ["teams", "names", "leagues", "plusminus",
+                               "home", "away", "homeRate", "awayRate"])
+
+
+def loadSeason(db, season):
+    """Pull a season's teams and remaining games into NumPy arrays.
+
+    Each remaining game gets expected home and away runs from the teams'
+    runs_for/runs_against per game, scaled by the season average."""
+    teams = list(db.getSeasonTeams(season))
+    games = np.array(list(db.getRemainingGames(season)),
+                     dtype=np.int64).reshape(-1, 2)
+
+    ids = np.array([team[0] for team in teams], dtype=np.int64)
+    names = [team[1] for team in teams]
+    leagues = np.array([team[2] for team in teams], dtype=np.int64)
+    (wins, losses, runsFor, runsAgainst) = \
+        np.array([team[3:] for team in teams],
+                 dtype=np.float64).reshape(-1, 4).T
+
+    played = wins + losses
+    totalPlayed = played.sum()
+    if totalPlayed:
+        average = (runsFor.sum() + runsAgainst.sum()) / (2 * totalPlayed)
+    else:
+        average = DEFAULT_RUNS
+    average = max(average, 0.1)
+
+    offense = (runsFor + PRIOR_GAMES * average) / (played + PRIOR_GAMES)
+    defense = (runsAgainst + PRIOR_GAMES * average) / (played + PRIOR_GAMES)
+
+    # Team ids to array positions
+    order = np.argsort(ids)
+    home = order[np.searchsorted(ids, games[:, 0], sorter=order)]
+    away = order[np.searchsorted(ids, games[:, 1], sorter=order)]
+
+    homeRate = offense[home] * defense[away] / average
+    awayRate = offense[away] * defense[home] / average
+
+    return Season(ids, names, leagues, (wins - losses).astype(np.int64),
+                  home, away, homeRate, awayRate)
+
+
+def simulateChunk(season, iterations, seed):
+    """Play out the remaining games iterations times.
+
+    Returns per team first place credit summed over the iterations; teams
+    tied for first share the credit."""
+    rng = np.random.RandomState(seed)
+    teamCount = len(season.teams)
+    gameCount = len(season.home)
+
+    runsHome = rng.poisson(season.homeRate, size=(iterations, gameCount))
+    runsAway = rng.poisson(season.awayRate, size=(iterations, gameCount))
+    # Extra innings: settle ties in proportion to the scoring rates
+    homeShare = season.homeRate / (season.homeRate + season.awayRate)
+    extra = rng.random_sample((iterations, gameCount)) < homeShare
+    homeWins = (runsHome > runsAway) | ((runsHome == runsAway) & extra)
+
+    # Count wins per (iteration, team) in one bincount over flat indices
+    winners = np.where(homeWins, season.home, season.away)
+    winners += (np.arange(iterations) * teamCount)[:, np.newaxis]
+    wins = np.bincount(winners.ravel(), minlength=iterations * teamCount) \
+        .reshape(iterations, teamCount)
+
+    remaining = np.bincount(season.home, minlength=teamCount) + \
+        np.bincount(season.away, minlength=teamCount)
+    plusminus = season.plusminus + 2 * wins - remaining
+
+    credit = np.zeros(teamCount)
+    for league in np.unique(season.leagues):
+        columns = season.leagues == league
+        standings = plusminus[:, columns]
+        leaders = standings == standings.max(axis=1)[:, np.newaxis]
+        credit[columns] = (leaders / leaders.sum(axis=1)[:, np.newaxis]) \
+            .sum(axis=0)
+    return credit
+
+
+def simulateSeason(season, iterations=ITERATIONS, seed=None, jobs=1):
+    """Probability of each team finishing first in its league"""
+    if seed is None:
+        seed = random.SystemRandom().randrange(2 ** 32)
+
+    chunks = [(season, min(CHUNK, iterations - start), [seed, index])
+              for (index, start) in enumerate(range(0, iterations, CHUNK))]
+
+    if jobs > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            credits = list(executor.map(simulateChunk, *zip(*chunks)))
+    else:
+        credits = [simulateChunk(*chunk) for chunk in chunks]
+
+    return np.sum(credits, axis=0) / iterations
+
+
+def playoffOdds(db, season, iterations=ITERATIONS, seed=None, jobs=1):
+    """List of {"team", "league", "plusminus", "remaining", "first"} dicts,
+    grouped by league and most likely first"""
+    data = loadSeason(db, season)
+    logger.info("Simulating %s remaining games %s times" %
+                (len(data.home), iterations))
+
+    if len(data.teams):
+        odds = simulateSeason(data, iterations, seed, jobs)
+    else:
+        odds = np.zeros(0)
+
+    remaining = np.bincount(data.home, minlength=len(data.teams)) + \
+        np.bincount(data.away, minlength=len(data.teams))
+    results = [{
+            "team": data.names[index],
+            "league": int(data.leagues[index]),
+            "plusminus": int(data.plusminus[index]),
+            "remaining": int(remaining[index]),
+            "first": float(odds[index]),
+        } for index in range(len(data.teams))]
+    results.sort(key=lambda item: (item["league"], -item["first"],
+                                   -item["plusminus"], item["team"]))
+    return results
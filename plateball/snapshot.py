@@ -0,0 +1,229 @@
+#! /usr/bin/env python3.5
+# Copyright 2017 Gavin Hurlbut
+# vim:ts=4:sw=4:ai:et:si:sts=4
+
+"""Columnar season snapshots.
+
+A snapshot is a directory holding one NumPy .npy file per column, named
+"<table>.<column>.npy", plus manifest.json:
+
+    {
+        "format": "plateball-snapshot",
+        "version": 1,
+        "season": 3,
+        "exported": 1500000000,
+        "tables": {
+            "game": {
+                "rows": 312,
+                "columns": {"id": {"file": "game.id.npy", "dtype": "<i8"},
+                            ...}
+            },
+            ...
+        }
+    }
+
+Integer columns are little-endian int64 and the text columns (league.name,
+team.team) fixed width unicode, so every file can be opened with
+numpy.load(mmap_mode="r") or read directly from its .npy header.  Rows are
+in id order.  A game without a scheduled round has round 0.  The manifest
+is written last, so a directory without one is an incomplete export."""
+
+import json
+import logging
+import os
+import tempfile
+import time
+
+import numpy as np
+from peewee import fn
+
+from plateball.database.access import chunked, INSERT_CHUNK
+from plateball.database.schema import League, Team, Game, Inning
+from plateball.stats import loadColumns
+
+logger = logging.getLogger(__name__)
+
+FORMAT = "plateball-snapshot"
+VERSION = 1
+MANIFEST = "manifest.json"
+
+# (table, model, columns, text columns) in load order
+TABLES = [
+    ("league", League, ["id", "name", "season"], ["name"]),
+    ("team", Team, ["id", "team", "league", "wins", "losses", "runs_for",
+                    "runs_against"], ["team"]),
+    ("game", Game, ["id", "home_team", "away_team", "runs_home",
+                    "runs_away", "complete", "round"], []),
+    ("inning", Inning, ["id", "game", "inning", "runs_home", "runs_away"],
+     []),
+]
+
+# Foreign key columns and the table they point at
+REFERENCES = {
+    "team": {"league": "league"},
+    "game": {"home_team": "team", "away_team": "team"},
+    "inning": {"game": "game"},
+}
+
+
+def seasonQueries(season):
+    """Select each table's snapshot columns for one season, in id order"""
+    leagues = League.select(League.id).where(League.season == season)
+    teams = Team.select(Team.id).where(Team.league << leagues)
+    games = Game.select(Game.id).where(Game.home_team << teams)
+    where = {
+        "league": League.season == season,
+        "team": Team.league << leagues,
+        "game": Game.home_team << teams,
+        "inning": Inning.game << games,
+    }
+
+    queries = {}
+    for (table, model, columns, text) in TABLES:
+        fields = [getattr(model, column) for column in columns]
+        if table == "game":
+            fields[columns.index("round")] = fn.COALESCE(Game.round, 0)
+        queries[table] = model.select(*fields).where(where[table]) \
+            .order_by(model.id).tuples()
+    return queries
+
+
+def exportSeason(db, season, directory):
+    """Write a season to a snapshot directory, returning the manifest"""
+    if os.path.exists(os.path.join(directory, MANIFEST)):
+        raise ValueError("Snapshot already exists in %s" % directory)
+    if not db.useSeason(season):
+        raise ValueError("Season %s has no games file" % season)
+    os.makedirs(directory, exist_ok=True)
+
+    manifest = {
+        "format": FORMAT,
+        "version": VERSION,
+        "season": season,
+        "exported": int(time.time()),
+        "tables": {},
+    }
+
+    with db.execution_context():
+        queries = seasonQueries(season)
+        for (table, model, columns, text) in TABLES:
+            if text:
+                # League and Team are a few rows a season
+                rows = list(queries[table])
+                data = {column: [row[index] for row in rows]
+                        for (index, column) in enumerate(columns)}
+                arrays = {column: np.array(data[column], dtype=str
+                                           if column in text else np.int64)
+                          for column in columns}
+            else:
+                values = loadColumns(queries[table], len(columns))
+                arrays = {column: values[:, index]
+                          for (index, column) in enumerate(columns)}
+
+            entry = {"rows": 0, "columns": {}}
+            for column in columns:
+                filename = "%s.%s.npy" % (table, column)
+                array = np.ascontiguousarray(arrays[column])
+                np.save(os.path.join(directory, filename), array)
+                entry["rows"] = len(array)
+                entry["columns"][column] = {"file": filename,
+                                            "dtype": array.dtype.str}
+            manifest["tables"][table] = entry
+            logger.info("Exported %s %s rows" % (entry["rows"], table))
+
+    (fd, tmpname) = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmpname, os.path.join(directory, MANIFEST))
+    return manifest
+
+
+def loadSnapshot(directory, mmap=True):
+    """Read a snapshot's manifest and memory map its columns.
+
+    Returns (manifest, {table: {column: array}})."""
+    with open(os.path.join(directory, MANIFEST), "r") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT:
+        raise ValueError("%s is not a plateball snapshot" % directory)
+    if manifest.get("version") != VERSION:
+        raise ValueError("Unsupported snapshot version %s" %
+                         manifest.get("version"))
+
+    tables = {}
+    for (table, model, columns, text) in TABLES:
+        entry = manifest["tables"][table]
+        tables[table] = {
+            column: np.load(os.path.join(directory,
+                                         entry["columns"][column]["file"]),
+                            mmap_mode="r" if mmap else None)
+            for column in columns}
+    return (manifest, tables)
+
+
+def idOffset(db, model, ids):
+    """0 if ids are all free in the model's table, else the shift that moves
+    them past the current maximum id.  Game ids are checked across every
+    season of a partitioned database."""
+    if not len(ids):
+        return 0
+    (low, high) = (int(ids.min()), int(ids.max()))
+    if model is Game:
+        if not db.gameIdsTaken(low, high):
+            return 0
+        return db.nextGameId() - low
+
+    if not model.select().where(model.id >= low, model.id <= high).exists():
+        return 0
+    return (model.select(fn.MAX(model.id)).scalar() or 0) + 1 - low
+
+
+def importSeason(db, directory):
+    """Load a snapshot in one transaction, returning the manifest.
+
+    Original ids are kept when they are free, so printed scorecards still
+    match their games; otherwise a table's ids are shifted past its current
+    maximum and the foreign keys pointing at it follow."""
+    (manifest, tables) = loadSnapshot(directory)
+    season = manifest["season"]
+    names = tables["league"]["name"].tolist()
+    db.useSeason(season, create=True)
+
+    with db.execution_context():
+        existing = League.select().where(League.season == season,
+                                         League.name << names).count() \
+            if names else 0
+        if existing:
+            raise ValueError("Season %s already has leagues named %s" %
+                             (season, ", ".join(names)))
+
+        offsets = {}
+        for (table, model, columns, text) in TABLES:
+            offsets[table] = idOffset(db, model, tables[table]["id"])
+            if offsets[table]:
+                logger.warning("Renumbering %s ids by %s" %
+                               (table, offsets[table]))
+
+        for (table, model, columns, text) in TABLES:
+            arrays = dict(tables[table])
+            arrays["id"] = arrays["id"] + offsets[table]
+            for (column, target) in REFERENCES.get(table, {}).items():
+                arrays[column] = arrays[column] + offsets[target]
+
+            values = [arrays[column].tolist() for column in columns]
+            if table == "game":
+                index = columns.index("round")
+                values[index] = [item or None for item in values[index]]
+
+            rows = (dict(zip(columns, row)) for row in zip(*values))
+            for chunk in chunked(rows, INSERT_CHUNK):
+                model.insert_many(chunk).execute()
+            logger.info("Imported %s %s rows" % (len(arrays["id"]), table))
+
+        leagues = (tables["league"]["id"] + offsets["league"]).tolist()
+        if leagues:
+            db.populateStandings(leagues)
+        if db.partitioned:
+            db.updatePartition()
+
+    return manifest
@@ -0,0 +1,167 @@
+#! /usr/bin/env python3.5
+# Copyright 2017 Gavin Hurlbut
+# vim:ts=4:sw=4:ai:et:si:sts=4
+
+import logging
+from itertools import chain
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+REGULATION = 9
+# Half innings with this many runs or more share the last histogram bucket
+MAX_RUNS = 10
+
+
+def loadColumns(query, columns):
+    """Stream a .tuples() query into a (rows, columns) int64 array without
+    building a model instance, or even a list, per row"""
+    flat = np.fromiter(chain.from_iterable(query.iterator()), dtype=np.int64)
+    return flat.reshape(-1, columns)
+
+
+def inningStats(innings, totals, maxRuns=MAX_RUNS):
+    """Per inning scoring and game level rates.
+
+    innings is (game id, inning, runs home, runs away) as an array from
+    loadColumns, totals the matching gameTotals."""
+    inningNums = innings[:, 1]
+    inningCount = int(inningNums.max()) if len(innings) else 0
+    results = {
+        "games": len(totals[0]),
+        "innings": [],
+    }
+
+    for (side, column) in (("home", 2), ("away", 3)):
+        runs = np.minimum(innings[:, column], maxRuns)
+        # One bincount over (inning, runs) pairs builds every histogram
+        counts = np.bincount(inningNums * (maxRuns + 1) + runs,
+                             minlength=(inningCount + 1) * (maxRuns + 1)) \
+            .reshape(inningCount + 1, maxRuns + 1)
+        runTotals = np.bincount(inningNums, weights=innings[:, column],
+                                minlength=inningCount + 1)
+        for inning in range(1, inningCount + 1):
+            if inning > len(results["innings"]):
+                results["innings"].append({"inning": inning})
+            halves = int(counts[inning].sum())
+            results["innings"][inning - 1][side] = {
+                "halves": halves,
+                "mean": float(runTotals[inning] / halves) if halves else 0.0,
+                "runs": counts[inning].tolist(),
+            }
+
+    (lastInning, runsHome, runsAway, lastHome) = totals
+    if not len(lastInning):
+        results.update(extra_innings=0.0, walk_offs=0.0, home_wins=0.0)
+        return results
+
+    homeWins = runsHome > runsAway
+    # The home side went ahead in its last at bat without trailing after
+    # it; innings the home team didn't need to bat are recorded as 0 runs
+    walkOffs = homeWins & (lastInning >= REGULATION) & (lastHome > 0) & \
+        (runsHome - lastHome <= runsAway)
+
+    results["extra_innings"] = float(np.mean(lastInning > REGULATION))
+    results["walk_offs"] = float(np.mean(walkOffs))
+    results["home_wins"] = float(np.mean(homeWins))
+    return results
+
+
+def gameTotals(games, innings):
+    """Vectorized group by game: (last inning, runs home, runs away, home
+    runs in the last inning) arrays with one entry per row of games"""
+    order = np.argsort(games[:, 0])
+    gameIndex = order[np.searchsorted(games[:, 0], innings[:, 0],
+                                      sorter=order)]
+    count = len(games)
+
+    runsHome = np.bincount(gameIndex, weights=innings[:, 2],
+                           minlength=count).astype(np.int64)
+    runsAway = np.bincount(gameIndex, weights=innings[:, 3],
+                           minlength=count).astype(np.int64)
+    lastInning = np.zeros(count, dtype=np.int64)
+    np.maximum.at(lastInning, gameIndex, innings[:, 1])
+
+    isLast = innings[:, 1] == lastInning[gameIndex]
+    lastHome = np.zeros(count, dtype=np.int64)
+    lastHome[gameIndex[isLast]] = innings[isLast, 2]
+    return (lastInning, runsHome, runsAway, lastHome)
+
+
+def teamSplits(games, totals, teams):
+    """Home and away records per team.
+
+    games is (game id, home team, away team) as an array from loadColumns,
+    totals the matching gameTotals and teams a list of (id, name, league)
+    to report.  Returns a list of dicts."""
+    (lastInning, runsHome, runsAway, lastHome) = totals
+
+    # Team ids are small, so a lookup array maps them to report rows;
+    # teams outside the report (interleague opponents) map to count
+    ids = np.array([team[0] for team in teams], dtype=np.int64)
+    count = len(ids)
+    maxId = int(ids.max()) if count else 0
+    if len(games):
+        maxId = max(maxId, int(games[:, 1:].max()))
+    lookup = np.full(maxId + 1, count, dtype=np.int64)
+    lookup[ids] = np.arange(count)
+    home = lookup[games[:, 1]]
+    away = lookup[games[:, 2]]
+    homeWins = runsHome > runsAway
+
+    def tally(index, wins, runsFor, runsAgainst):
+        return [np.bincount(index, weights=values, minlength=count + 1)
+                [:count].astype(np.int64)
+                for values in (wins, ~wins, runsFor, runsAgainst)]
+
+    (hw, hl, hrf, hra) = tally(home, homeWins, runsHome, runsAway)
+    (aw, al, arf, ara) = tally(away, ~homeWins, runsAway, runsHome)
+
+    return [{
+            "team": teams[index][1],
+            "league": teams[index][2],
+            "home_wins": int(hw[index]),
+            "home_losses": int(hl[index]),
+            "home_runs_for": int(hrf[index]),
+            "home_runs_against": int(hra[index]),
+            "away_wins": int(aw[index]),
+            "away_losses": int(al[index]),
+            "away_runs_for": int(arf[index]),
+            "away_runs_against": int(ara[index]),
+        } for index in range(count)]
+
+
+def loadGames(db, season=None, league=None):
+    """(games, innings) arrays for getCompletedGames and getCompletedInnings.
+
+    Every season of a partitioned database is read one file at a time and
+    the arrays joined, as attaching them all at once runs into SQLite's
+    limit on attached databases.  Game ids are unique across seasons."""
+    if season is not None or league is not None or not db.partitioned:
+        return (loadColumns(db.getCompletedGames(season, league), 3),
+                loadColumns(db.getCompletedInnings(season, league), 4))
+
+    previous = db.activeSeason
+    loaded = [loadGames(db, item) for item in db.partitionSeasons()]
+    if previous is not None:
+        db.useSeason(previous)
+    games = [item[0] for item in loaded] + [np.zeros((0, 3), np.int64)]
+    innings = [item[1] for item in loaded] + [np.zeros((0, 4), np.int64)]
+    return (np.concatenate(games), np.concatenate(innings))
+
+
+def seasonStats(db, season=None, league=None):
+    """Inning by inning statistics for a season, one league's games, or
+    with neither, every season"""
+    (games, innings) = loadGames(db, season, league)
+    logger.info("Loaded %s games, %s innings" % (len(games), len(innings)))
+
+    teams = [(team[0], team[1], team[2])
+             for team in db.getSeasonTeams(season)
+             if league is None or team[2] == league.id]
+
+    totals = gameTotals(games, innings)
+    results = inningStats(innings, totals)
+    results["teams"] = teamSplits(games, totals, teams)
+    return results